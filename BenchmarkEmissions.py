@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""
+compares the compiled EmissionOperator against band-by-band concatenation of VER
+
+python BenchmarkEmissions.py -n 200
+"""
+from pathlib import Path
+from argparse import ArgumentParser
+from timeit import repeat
+import numpy as np
+import xarray
+from gridaurora.calcemissions import (
+    emissionoperator,
+    getMetastable,
+    getAtomic,
+    getN21NG,
+    getN2meinel,
+    getN22PG,
+    getN21PG,
+    sortelimlambda,
+)
+
+R = Path(__file__).parent
+reactions = ["no1s", "no1d", "noii2p", "po3p3p", "po3p5p", "p1ng", "pmein", "p2pg", "p1pg"]
+families = ["metastable", "atomic", "n21ng", "n2meinel", "n22pg", "n21pg"]
+
+
+def concatver(rates: xarray.DataArray, reactfn: Path):
+    ver = lamb = br = None
+    for get in (getMetastable, getAtomic, getN21NG, getN2meinel, getN22PG, getN21PG):
+        ver, lamb, br = get(rates, ver, lamb, br, reactfn)
+
+    return sortelimlambda(lamb, ver, br)
+
+
+def main():
+    p = ArgumentParser(description="benchmark VER computation from excitation rates")
+    p.add_argument("-n", "--nalt", help="number of altitude bins", type=int, default=200)
+    p.add_argument("-N", "--number", help="calls per timing", type=int, default=100)
+    p.add_argument("--reactfn", help="reaction coefficient file", default=R / "gridaurora/precompute/vjeinfc.h5")
+    p = p.parse_args()
+
+    z = np.linspace(90, 1000, p.nalt)
+    rates = np.random.default_rng(0).random((p.nalt, len(reactions)))
+    rates = xarray.DataArray(rates, coords=[("alt_km", z), ("reaction", reactions)])
+
+    op = emissionoperator(families, p.reactfn)
+
+    tcat = min(repeat(lambda: concatver(rates, p.reactfn), number=p.number, repeat=5)) / p.number
+    top = min(repeat(lambda: op(rates), number=p.number, repeat=5)) / p.number
+
+    print(f"{p.nalt} altitudes x {op.wavelength_nm.size} wavelengths")
+    print(f"concatenate: {tcat * 1e6:.1f} us   operator: {top * 1e6:.1f} us   speedup: {tcat / top:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""
+compares vectorized Strickland fluxgen with the per-E0 loop implementation it replaced
+
+python BenchmarkFlux.py -N 10000
+"""
+from argparse import ArgumentParser
+from timeit import repeat
+import numpy as np
+from gridaurora.eFluxGen import fluxgen, gaussflux, letail, midtail
+
+
+def fluxgen_loop(E, E0, Q0, Wbc, bl, bm, bh, Bm, Bhf):
+    """
+    previous implementation: per-E0 Python loop in hitail, four full E x E0 temporaries
+    """
+    Wb = Wbc * E0
+
+    isimE0 = abs(E[:, None] - E0).argmin(axis=0)
+
+    base = gaussflux(E, Wb, E0, Q0)
+    diffnumflux = base.copy()
+    low = letail(E, E0, Q0, bl)
+    diffnumflux += low
+    mid = midtail(E, E0, bm, Bm)
+    diffnumflux += mid
+
+    Bh = np.empty_like(E0)
+    for iE0 in np.arange(E0.size):
+        Bh[iE0] = Bhf[iE0] * diffnumflux[isimE0[iE0], iE0]
+    hi = Bh * (E[:, None] / E0) ** -bh
+    hi[E[:, None] < E0] = 0.0
+    diffnumflux += hi
+
+    Q = np.trapz(diffnumflux, E, axis=0)
+
+    return np.asfortranarray(diffnumflux), low, mid, hi, base, Q
+
+
+def main():
+    p = ArgumentParser(description="benchmark Strickland flux generation")
+    p.add_argument("-E", "--nenergy", help="number of energy bins", type=int, default=200)
+    p.add_argument("-N", "--nparam", help="number of parameter sets", type=int, default=10000)
+    p = p.parse_args()
+
+    rng = np.random.default_rng(0)
+    N = p.nparam
+
+    E = np.logspace(2, 4.35, num=p.nenergy, base=10)
+    E0 = 10 ** rng.uniform(2.5, 4, N)
+    Wbc = rng.uniform(0.25, 1.1, N)
+    bm = rng.uniform(2.5, 3, N)
+    Bm0 = rng.uniform(2000, 6500, N)
+    Bhf = rng.uniform(0.125, 0.5, N)
+    args = (E, E0, 1e12, Wbc, 0.8, bm, 4.0, Bm0, Bhf)
+
+    ref = fluxgen_loop(*args)[0]
+    assert (fluxgen(*args, components=False)[0] == ref).all()
+
+    tloop = min(repeat(lambda: fluxgen_loop(*args), number=1, repeat=3))
+    tvec = min(repeat(lambda: fluxgen(*args), number=1, repeat=3))
+    tinplace = min(repeat(lambda: fluxgen(*args, components=False), number=1, repeat=3))
+
+    print(f"{E.size} energy bins x {N} parameter sets")
+    print(f"loop: {tloop * 1e3:.1f} ms   vectorized: {tvec * 1e3:.1f} ms   in-place, no components: {tinplace * 1e3:.1f} ms")
+    print(f"speedup: {tloop / tinplace:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+"""
+consolidates filter, window and QE curves into one memory-mapped response library
+
+python BuildResponseLibrary.py ~/data/responses.npy
+"""
+from pathlib import Path
+from argparse import ArgumentParser
+from gridaurora.responselib import buildresponselib, responselibrary, WLNM
+
+R = Path(__file__).parent
+
+
+def main():
+    p = ArgumentParser(description="build instrument response library from transmission curve HDF5 files")
+    p.add_argument("outfn", help=".npy library file to write (header .json alongside)")
+    p.add_argument("-i", "--indir", help="directory of curve .h5 files", default=R / "gridaurora/precompute")
+    p.add_argument("--wlnm", help="START STOP STEP wavelength grid [nm]", nargs=3, type=float, default=WLNM)
+    p = p.parse_args()
+
+    fn = buildresponselib(p.outfn, Path(p.indir).expanduser().glob("*.h5"), p.wlnm)
+
+    lib = responselibrary(fn)
+    print(f"{fn}: {len(lib.names)} curves x {lib.size} wavelengths")
+    for k, m in lib.meta.items():
+        print(f"{k:>12s}  {m['kind']:>6s}  {m['range_nm'][0]:.1f}..{m['range_nm'][1]:.1f} nm  {m['name']}")
+
+
+if __name__ == "__main__":
+    main()
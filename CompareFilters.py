@@ -3,9 +3,9 @@ from pathlib import Path
 from numpy import arange
 from argparse import ArgumentParser
 from matplotlib.pyplot import show
-from gridaurora.filterload import getSystemT
+import xarray
+from gridaurora.filterload import getSystemTfilters, TransmittanceStack
 import gridaurora.plots as gap
-from typing import List
 import seaborn as sns
 
 sns.set_style("whitegrid")
@@ -14,14 +14,6 @@ sns.set_context("talk", font_scale=1.5)
 R = Path(__file__).parent
 
 
-def selftest(
-    bg3fn: Path, windfn: Path, qefn: Path, mmsLambda: List[float], obsalt_km: float, zenang_deg: float,
-):
-
-    newLambda = arange(mmsLambda[0], mmsLambda[1] + mmsLambda[2], mmsLambda[2], dtype=float)
-    return getSystemT(newLambda, bg3fn, windfn, qefn, obsalt_km, zenang_deg)
-
-
 def main():
     p = ArgumentParser(description="Plots spectral transmission data from filter datasheets")
     p.add_argument(
@@ -45,22 +37,17 @@ def main():
 
     windFN = inpath / "ixonWindowT.h5"
     qeFN = inpath / "emccdQE.h5"
-    # %%
-    Ts = []
-    for f in flist:
-        T = selftest(f, windFN, qeFN, p.wlnm, p.altkm, p.zenang)
-        Ts.append(T)
-        # gap.plotT(T, p.wlnm,fname)
+    # %% all filters in one pass
+    newLambda = arange(p.wlnm[0], p.wlnm[1] + p.wlnm[2], p.wlnm[2], dtype=float)
+    T = getSystemTfilters(newLambda, flist, windFN, qeFN, p.altkm, p.zenang)
     # %% Rayleigh 1924
-    Tr = 1.0
     RayleighFilterNames = ["Hoya V-10", "Wratten 21"]
-    for r in RayleighFilterNames:
-        Tr *= Ts[r]["filter"]
-    Tr.filename = "Rayleigh 1924"
-    Ts.append(Tr)
-
+    S = TransmittanceStack(newLambda)  # filter curves are already cached by getSystemTfilters
+    for f in flist:
+        S.addfilter(f)
+    Tr = xarray.DataArray(S(*RayleighFilterNames)[None, :], coords=[("filter", ["Rayleigh 1924"]), ("wavelength_nm", newLambda)])
     # %%
-    gap.comparefilters(Ts, RayleighFilterNames)
+    gap.comparefilters(xarray.concat((T["filterT"].drop_vars("filename"), Tr), dim="filter"))
 
     show()
 
@@ -7,24 +7,7 @@ as is commonly stated.
 import numpy as np
 from matplotlib.pyplot import figure, show
 from argparse import ArgumentParser
-
-
-def EllisonRamaty(E: np.ndarray, E0: np.ndarray, gamma: np.ndarray, kappa: np.ndarray, C0: np.ndarray):
-    E, E0, gamma, kappa, C0 = dimhandler(E, E0, gamma, kappa, C0)
-    # %% do work
-    return C0 * E[:, None] ** (-gamma) * np.exp(-(((E[:, None] - E0) / np.gradient(E)[:, None]) ** kappa))
-
-
-def dimhandler(E, E0, gamma, kappa, C0=None):
-    # %% lite input validation
-    E = np.asarray(E)
-    E0 = np.atleast_1d(E0)
-    gamma = np.atleast_1d(gamma)
-    kappa = np.atleast_1d(kappa)
-    C0 = np.atleast_1d(C0)
-    assert E.ndim == E0.ndim == gamma.ndim == kappa.ndim == C0.ndim == 1, "E0, gamma, kappa, C0: scalar or vector. E: vector"
-
-    return E, E0, gamma, kappa, C0
+from gridaurora.eFluxGen import EllisonRamaty, dimhandler
 
 
 def plotdnf(E, phi, E0, gamma, kappa):
@@ -52,24 +52,26 @@ def main():
     # %%
     tctime = tr.readTranscarInput(simpath / p.datcarfn)
 
-    excrates = excrates.isel(time=tReqInd)
-    t = excrates.time
+    # all times in one call, then pick the requested time
+    tver, _, tbr = calcemissions(excrates["excitation"], sim)
+    ver = tver.isel(time=tReqInd)
+    br = tbr[tReqInd]
+    t = ver.time
 
     if t < np.datetime64(tctime["tstartPrecip"]):
         logging.warning("you picked a time before precipitation started, so youre looking at AIRGLOW instead of AURORA!")
 
-    tver, ver, br = calcemissions(excrates["excitation"], sim)
-    optT = getSystemT(tver.index, sim.bg3fn, sim.windowfn, sim.qefn, sim.obsalt_km, sim.zenang)
+    optT = getSystemT(ver.wavelength_nm, sim.bg3fn, sim.windowfn, sim.qefn, sim.obsalt_km, sim.zenang)
     # %% write as hdf5
     if p.outfile:
         h5fn = Path(p.outfile).expanduser()
         print("writing", h5fn)
         with h5py.File(h5fn, "w") as f:
-            d = f.create_dataset("/ver", data=tver.values)  # volume emission rate per beam vs. altitude and wavelength
+            d = f.create_dataset("/ver", data=ver.values)  # volume emission rate per beam vs. altitude and wavelength
             d.attrs["units"] = "photons cm^-3 sr^-1 s^-1 eV^-1"
-            d = f.create_dataset("/wavelength", data=tver.index)
+            d = f.create_dataset("/wavelength", data=ver.wavelength_nm)
             d.attrs["units"] = "nm"
-            d = f.create_dataset("/altitude", data=tver.columns)
+            d = f.create_dataset("/altitude", data=ver.alt_km)
             d.attrs["units"] = "km"
     # %% plots
     if p.makeplot:
@@ -80,8 +82,8 @@ def main():
         # details of individual reactions
         for r in p.reacreq:
             sim.reacreq = r
-            ver, tver, br = calcemissions(excrates, tReqInd, sim)
-            showIncrVER(t, tReqInd, tctime, ver, tver, str(r), p.makeplot)
+            tver = calcemissions(excrates["excitation"], sim)[0]
+            showIncrVER(tver.time, tReqInd, tctime, tver.isel(time=tReqInd), tver, str(r), p.makeplot)
 
         show()
 
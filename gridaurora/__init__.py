@@ -1,46 +1,35 @@
-from datetime import datetime, date
+from datetime import datetime, date, timezone
 from dateutil.parser import parse
 import numpy as np
-import logging
+import warnings
 from typing import Union
 
 
-def toyearmon(time: datetime) -> int:
-    # %% date handle
-    if isinstance(time, (tuple, list, np.ndarray)):
-        logging.warning(f"taking only first time {time[0]}, would you like multiple times upgrade to code?")
-        time = time[0]
-
-    if isinstance(time, str):
-        time = parse(time)
-    elif isinstance(time, np.datetime64):
-        time = time.astype(datetime)
-    elif isinstance(time, (datetime, date)):
-        pass
-    else:
-        raise TypeError(f"not sure what to do with type {type(time)}")
+def toyearmon(time: Union[str, datetime, np.datetime64, np.ndarray]) -> Union[int, np.ndarray]:
+    """
+    year and month as integer YYYYMM, e.g. 201507.
+    Arrays of times give arrays of YYYYMM.
+    """
+    t = todatetime64(time)
 
-    ym = int(f"{time.year:d}{time.month:02d}")
+    ym = (t.astype("datetime64[Y]").astype(int) + 1970) * 100 + t.astype("datetime64[M]").astype(int) % 12 + 1
 
-    return ym
+    return int(ym) if ym.ndim == 0 else ym
 
 
 def to_ut1unix(time: Union[str, datetime, float, np.ndarray]) -> np.ndarray:
     """
-    converts time inputs to UT1 seconds since Unix epoch
+    converts time inputs to UT1 seconds since Unix epoch.
+    Times with a time zone are converted to UTC, times without are taken as UTC.
     """
-    # keep this order
-    time = totime(time)
+    if np.issubdtype(np.asarray(time).dtype, np.number):  # already seconds
+        return totime(time)
+
+    time = todatetime64(time)
 
-    if isinstance(time, (float, int)):
-        return time
+    ut1 = (time - np.datetime64("1970-01-01T00:00:00", "us")) / np.timedelta64(1, "s")
 
-    if isinstance(time, (tuple, list, np.ndarray)):
-        assert isinstance(time[0], datetime), f"expected datetime, not {type(time[0])}"
-        return np.array(list(map(dt2ut1, time)))
-    else:
-        assert isinstance(time, datetime)
-        return dt2ut1(time)
+    return ut1.squeeze()[()]
 
 
 def dt2ut1(t: datetime) -> float:
@@ -56,11 +45,72 @@ def totime(time: Union[str, datetime, np.datetime64]) -> np.ndarray:
     if isinstance(time[0], (datetime, np.datetime64)):
         pass
     elif isinstance(time[0], str):
-        time = np.atleast_1d(list(map(parse, time)))
+        time = todatetime64(time).astype(datetime)
 
     return time.squeeze()[()]
 
 
+def todatetime64(time: Union[str, datetime, date, np.datetime64, np.ndarray]) -> np.ndarray:
+    """
+    converts scalar or array of ISO 8601 str, datetime, date or datetime64 to datetime64[us] in bulk.
+    Strings numpy cannot parse (e.g. "July 1, 2015", with time zone or ISO 8601 basic "20150701")
+    fall back to dateutil one by one.
+    Times with a time zone are converted to UTC.
+    """
+    if isinstance(time, (datetime, date)):
+        return np.datetime64(_usepoch(time), "us")
+    if isinstance(time, (list, tuple)) and all(isinstance(t, (datetime, date)) for t in time):
+        time = np.fromiter(map(_usepoch, time), dtype=np.int64, count=len(time))
+        return time.astype("datetime64[us]")
+
+    time = np.asarray(time)
+
+    if time.dtype.kind == "M":
+        return time.astype("datetime64[us]")
+    elif time.dtype.kind in "US":
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("error", DeprecationWarning)  # time zone in string
+                if _extendedform(time):
+                    return time.astype("datetime64[us]")
+        except (ValueError, DeprecationWarning):
+            pass
+        us = np.fromiter((_usepoch(parse(t)) for t in time.ravel()), dtype=np.int64, count=time.size)
+        return us.astype("datetime64[us]").reshape(time.shape)
+    elif time.dtype.kind == "O" and all(isinstance(t, (datetime, date)) for t in time.flat):
+        # integer microseconds since epoch: several times faster than numpy's conversion of datetime objects
+        us = np.fromiter(map(_usepoch, time.flat), dtype=np.int64, count=time.size)
+        return us.astype("datetime64[us]").reshape(time.shape)
+
+    raise TypeError(f"not sure what to do with type {time.dtype}")
+
+
+def _extendedform(time: np.ndarray) -> bool:
+    """
+    False if any string starting with a digit is not YYYY-... or YYYY: numpy would read ISO 8601 basic "20150701"
+    or a number "1435708800" as the year
+    """
+    char = np.uint32 if time.dtype.kind == "U" else np.uint8
+    if time.size == 0 or time.itemsize // np.dtype(char).itemsize < 5:
+        return True
+
+    c = np.ascontiguousarray(time).ravel().view(char).reshape(time.size, -1)  # one row of character codes per string
+    digit = (c[:, 0] >= ord("0")) & (c[:, 0] <= ord("9"))
+
+    return bool(((c[:, 4] == ord("-")) | (c[:, 4] == 0) | ~digit).all())
+
+
+def _usepoch(t: Union[datetime, date]) -> int:
+    if not isinstance(t, datetime):
+        t = datetime(t.year, t.month, t.day)
+    elif t.tzinfo is not None:
+        t = t.astimezone(timezone.utc).replace(tzinfo=None)
+
+    dt = t - datetime(1970, 1, 1)
+
+    return (dt.days * 86400 + dt.seconds) * 1000000 + dt.microseconds
+
+
 def chapman_profile(Z0: float, zKM: np.ndarray, H: float):
     """
     Z0: altitude [km] of intensity peak
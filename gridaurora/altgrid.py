@@ -0,0 +1,104 @@
+"""
+altitude grids shared between modules, built once and memoized on their parameters.
+
+Each AltGrid carries trapezoid weights, so column integration along altitude is one dot product:
+AltGrid(z).integrate(ver, axis=-2) == np.trapz(ver, z, axis=-2)
+
+Arrays of an AltGrid are read-only since the same object is handed to every caller.
+"""
+from collections import OrderedDict
+from functools import lru_cache
+import hashlib
+import numpy as np
+from .ztanh import setupz
+from .zglow import glowalt
+
+ALTGRID_CACHESIZE = 32  # maximum number of altitude grids kept in memory
+_gridcache: "OrderedDict[str, AltGrid]" = OrderedDict()
+
+
+class AltGrid:
+    """
+    z: altitude [km], in the order given. As np.trapz, weights are signed:
+       a decreasing grid integrates to the negative, repeated altitudes contribute nothing.
+
+    dz: spacing between altitudes, size z-1
+    edges: cell edges at midpoints between altitudes, ends at z[0] and z[-1]
+    w: trapezoid weights == np.diff(edges)
+    """
+
+    def __init__(self, z: np.ndarray):
+        z = np.array(z, dtype=float)
+        if z.ndim != 1 or z.size < 2:
+            raise ValueError("altitude grid must be a vector of at least 2 points")
+
+        dz = np.diff(z)
+        edges = np.concatenate(([z[0]], (z[:-1] + z[1:]) / 2, [z[-1]]))
+
+        w = np.zeros(z.size)
+        w[:-1] += dz / 2
+        w[1:] += dz / 2
+
+        for a in (z, dz, edges, w):
+            a.flags.writeable = False
+
+        self.z = z
+        self.dz = dz
+        self.edges = edges
+        self.w = w
+
+    def __len__(self) -> int:
+        return self.z.size
+
+    def integrate(self, x: np.ndarray, axis: int = 0) -> np.ndarray:
+        """
+        column integral of x along its altitude axis
+        """
+        x = np.asarray(x)
+        if x.shape[axis] != self.z.size:
+            raise ValueError(f"axis {axis} of length {x.shape[axis]} does not match {self.z.size} altitudes")
+
+        return np.moveaxis(x, axis, -1) @ self.w
+
+
+def altgrid(z) -> AltGrid:
+    """
+    shared AltGrid for altitudes z [km], e.g. the alt_km coordinate of Transcar rates
+    """
+    if isinstance(z, AltGrid):
+        return z
+
+    z = np.asarray(z, dtype=float)
+    key = hashlib.sha1(np.ascontiguousarray(z).tobytes()).hexdigest()
+
+    grid = _gridcache.get(key)
+    if grid is None:
+        grid = _gridcache[key] = AltGrid(z)
+        while len(_gridcache) > ALTGRID_CACHESIZE:
+            _gridcache.popitem(last=False)
+    else:
+        _gridcache.move_to_end(key)
+
+    return grid
+
+
+@lru_cache(maxsize=ALTGRID_CACHESIZE)
+def ztanhgrid(Np: int, zmin: float, gridmin: float, gridmax: float) -> AltGrid:
+    """
+    shared AltGrid of ztanh.setupz
+    """
+    return altgrid(setupz(Np, zmin, gridmin, gridmax))
+
+
+@lru_cache(maxsize=None)
+def glowgrid() -> AltGrid:
+    """
+    shared AltGrid of the altitudes hard-coded in old NCAR GLOW
+    """
+    return altgrid(glowalt())
+
+
+def clearaltgrid():
+    _gridcache.clear()
+    ztanhgrid.cache_clear()
+    glowgrid.cache_clear()
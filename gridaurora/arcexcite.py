@@ -3,6 +3,9 @@
 creates optical emissions from excitation rates
 """
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from time import time
 import logging
 import xarray
 import numpy as np
@@ -11,10 +14,22 @@ import h5py
 #
 from gridaurora.opticalmod import opticalModel
 from gridaurora.calcemissions import calcemissions, sortelimlambda
+from gridaurora import profiling
 from transcarread import calcVERtc
 
 
-def getTranscar(sim, obsAlt_km: float, zenithang: float) -> tuple:
+@profiling.timed("arcexcite.getTranscar")
+def getTranscar(
+    sim, obsAlt_km: float, zenithang: float, workers: int = None, executor: str = "process", spillfn: Path = None
+) -> tuple:
+    """
+    workers: number of beams computed in parallel, default one at a time
+    executor: "process" or "thread" pool when workers is given
+    spillfn: HDF5 file to write the full energy x altitude x wavelength VER cube to, one beam at a time.
+             Only the wavelength-summed VER of each beam is kept in memory.
+
+    per-beam compute time [sec.] is in Peigen.attrs["beam_sec"], NaN for skipped beams
+    """
     zeroUnusedBeams = False
 
     if sim.loadver:  # from JGR2013, NOT used much
@@ -31,7 +46,7 @@ def getTranscar(sim, obsAlt_km: float, zenithang: float) -> tuple:
         Peigen = np.zeros((Plambda.shape[1], nEnergy), dtype=float, order="F")
         for iEn in range(nEnergy):
             # Transpose here because indexing Panel flips axes of Dataframe?
-            Peigen[:, iEn] = opticalModel(sim, Plambda.iloc[:, :, iEn].T, obsAlt_km, zenithang)
+            opticalModel(sim, Plambda.iloc[:, :, iEn].T, obsAlt_km, zenithang, out=Peigen[:, iEn])
 
         Peigenunfilt = Plambda.sum(axis=0)  # from matlab, which already did this
     else:  # read from transcar emissions.dat (TYPICALLY USED)
@@ -48,38 +63,110 @@ def getTranscar(sim, obsAlt_km: float, zenithang: float) -> tuple:
         lowestBeamUsedInd = getbeamsused(zeroUnusedBeams, Ek, sim.minbeamev)
         nEnergy = Ek.size - lowestBeamUsedInd
 
-        PlambdaAccum: np.ndarray = None  # for later testing
-        for iEn in range(nEnergy):
+        beam = partial(_beamver, sim, tReq, obsAlt_km, zenithang, spillfn is not None)
+        if workers:
+            Executor = {"process": ProcessPoolExecutor, "thread": ThreadPoolExecutor}[executor]
+            with Executor(max_workers=workers) as pool:
+                beams = pool.map(beam, Ek[:nEnergy])  # in beam order
+                Peigen, Peigenunfilt, z, beamsec = _accumbeams(beams, Ek, nEnergy, spillfn)
+        else:
+            Peigen, Peigenunfilt, z, beamsec = _accumbeams(map(beam, Ek[:nEnergy]), Ek, nEnergy, spillfn)
+
+        Peigenunfilt = xarray.DataArray(data=Peigenunfilt, coords=[("alt_km", z), ("energy_ev", Ek)])
+
+    Peigen = xarray.DataArray(data=Peigen, coords=[("alt_km", z), ("energy_ev", Ek)])
+    if not sim.loadver:
+        Peigen.attrs["beam_sec"] = beamsec
+
+    return Peigen, EKpcolor, Peigenunfilt
 
-            spec, tTC, tTCind = calcVERtc(sim.excratesfn, sim.transcarpath, Ek[iEn], tReq, sim)
 
-            Plambda, _, _ = calcemissions(spec, sim)
-            if Plambda is None:  # couldn't read this beam
+def _accumbeams(beams, Ek: np.ndarray, nEnergy: int, spillfn: Path = None) -> tuple:
+    """
+    assemble per-beam results in beam order, holding only Nalt x Nenergy arrays in memory
+    """
+    Peigen: np.ndarray = None
+    beamsec = np.full(Ek.size, np.nan)
+    f = h5py.File(Path(spillfn).expanduser(), "w") if spillfn else None
+
+    try:
+        for iEn, b in enumerate(beams):
+            if b is None:  # couldn't read this beam
                 logging.info(f"skipped reading beam {Ek[iEn]}")
                 continue
-            z = Plambda.alt_km
 
-            if iEn == lowestBeamUsedInd:
-                PlambdaAccum = np.zeros((Plambda.shape[0], Plambda.shape[1], nEnergy), order="F")
+            Plambda, z, unfilt, Peigen1, beamsec[iEn] = b
+            logging.info(f"beam {Ek[iEn]} eV: {beamsec[iEn]:.3f} sec.")
+
+            if Peigen is None:
+                iFirst = iEn
                 Peigen = np.zeros((z.size, nEnergy), dtype=float, order="F")
+                Peigenunfilt = np.zeros((z.size, nEnergy), dtype=float, order="F")
+                if f is not None:
+                    _spillsetup(f, Ek[:nEnergy], z, Plambda.wavelength_nm.values)
+
+            Peigenunfilt[:, iEn] = unfilt  # summed over wavelength
+            Peigen[:, iEn] = Peigen1
+            if f is not None:
+                f["/ver"][iEn, ...] = Plambda.values
+
+            if iEn != iFirst:
+                if all(Peigen[:, iEn] == Peigen[:, iFirst]):
+                    logging.error(f"all Peigen for beam {Ek[iEn]} equal Peigen: beam {Ek[iFirst]}")
+    finally:
+        if f is not None:
+            f.close()
+
+    if Peigen is None:  # no beams at all were read
+        raise ValueError("No beams were usable")
+
+    return Peigen, Peigenunfilt, z, beamsec
+
+
+def _spillsetup(f: h5py.File, Ek: np.ndarray, z: np.ndarray, lamb: np.ndarray):
+    d = f.create_dataset("/energy_ev", data=Ek)
+    d.attrs["unit"] = "eV"
+    d = f.create_dataset("/alt_km", data=z)
+    d.attrs["unit"] = "km"
+    d = f.create_dataset("/wavelength_nm", data=lamb)
+    d.attrs["unit"] = "nm"
+
+    d = f.create_dataset(
+        "/ver",
+        shape=(Ek.size, z.size, lamb.size),
+        chunks=(1, z.size, lamb.size),
+        dtype=float,
+        fillvalue=np.nan,
+        compression="gzip",
+    )
+    d.attrs["unit"] = "photons cm^-3 sr^-1 s^-1"
+    d.attrs["size"] = "NEnergy x Nalt x Nwavelength"
+    d.attrs["description"] = "unfiltered VER per beam, NaN for skipped beams"
 
-            PlambdaAccum[..., iEn] = Plambda  # Nalt x Nwavelength x Nenergy
-            Peigen[:, iEn] = opticalModel(sim, Plambda, obsAlt_km, zenithang)
 
-            if iEn != lowestBeamUsedInd:
-                if all(Peigen[:, iEn] == Peigen[:, lowestBeamUsedInd]):
-                    logging.error(f"all Peigen for beam {Ek[iEn]} equal Peigen: beam {Ek[lowestBeamUsedInd]}")
+def _beamver(sim, tReq, obsAlt_km: float, zenithang: float, keepver: bool, Ek: float) -> tuple:
+    """
+    VER summed over wavelength and filtered VER of one Transcar beam, None if the beam could not be read
+    keepver: also return the full altitude x wavelength VER
+    """
+    tic = time()
 
-        if PlambdaAccum is None:  # no beams at all were read
-            raise ValueError("No beams were usable")
+    with profiling.stage("arcexcite.calcVERtc"):
+        spec, tTC, tTCind = calcVERtc(sim.excratesfn, sim.transcarpath, Ek, tReq, sim)
 
-        Peigenunfilt = xarray.DataArray(
-            data=PlambdaAccum.sum(axis=1), coords=[("alt_km", z), ("energy_ev", Ek)],  # sum over wavelength axis=1
-        )
+    Plambda, _, _ = calcemissions(spec, sim)
+    if Plambda is None:
+        return None
 
-    Peigen = xarray.DataArray(data=Peigen, coords=[("alt_km", z), ("energy_ev", Ek)])
+    Peigen1 = opticalModel(sim, Plambda, obsAlt_km, zenithang, out=np.empty(Plambda.alt_km.size))
 
-    return Peigen, EKpcolor, Peigenunfilt
+    return (
+        Plambda if keepver else None,
+        Plambda.alt_km.values,
+        Plambda.sum("wavelength_nm").values,
+        Peigen1,
+        time() - tic,
+    )
 
 
 def getbeamsused(zeroUnusedBeams, Ek: float, minbeamenergy: float) -> int:
@@ -2,90 +2,238 @@
 from pathlib import Path
 import numpy as np
 import h5py
-from typing import Tuple
+from typing import Tuple, Dict
 import xarray
+from .altgrid import altgrid
+from . import profiling
 
 """
 inputs:
-spec: excitation rates, 3-D , dimensions time x altitude x reaction
+spec: excitation rates, dimensions ... x altitude x reaction  e.g. time x energy x altitude x reaction
 
 output:
-ver: a pandas DataFrame, wavelength x altitude
-br: flux-tube integrated intensity, dimension lamb
+ver: xarray.DataArray, ... x altitude x wavelength
+br: flux-tube integrated intensity, dimension ... x wavelength
 
 See Eqn 9 of Appendix C of Zettergren PhD thesis 2007 to get a better insight on what this set of functions do.
 """
 
+# reaction tables, keyed on (reaction file path, modification time)
+_reactcache: Dict[Tuple[str, int], Dict[str, Dict[str, np.ndarray]]] = {}
+_opcache: Dict[tuple, "EmissionOperator"] = {}
 
+
+@profiling.timed("calcemissions.calcemissions")
 def calcemissions(rates: xarray.DataArray, sim) -> Tuple[xarray.DataArray, np.ndarray, np.ndarray]:
     if not sim.reacreq:
         return 0.0, 0.0, 0.0
 
-    ver = None
-    lamb = None
-    br = None
+    return emissionoperator(sim.reacreq, sim.reactionfn)(rates)
+
+
+class EmissionOperator:
     """
+    For fixed requested reactions and reaction file, VER is linear in the excitation rates.
+    The map from the reaction columns to NaN-free, wavelength sorted VER is compiled into one
+    (reaction x wavelength) matrix, so that VER is a single matrix multiply.
+
     Franck-Condon factor
     http://chemistry.illinoisstate.edu/standard/che460/handouts/460-Feb28lec-S13.pdf
     http://assign3.chem.usyd.edu.au/spectroscopy/index.php
     """
-    # %% METASTABLE
-    if "metastable" in sim.reacreq:
-        ver, lamb, br = getMetastable(rates, ver, lamb, br, sim.reactionfn)
-    # %% PROMPT ATOMIC OXYGEN EMISSIONS
-    if "atomic" in sim.reacreq:
-        ver, lamb, br = getAtomic(rates, ver, lamb, br, sim.reactionfn)
-    # %% N2 1N EMISSIONS
-    if "n21ng" in sim.reacreq:
-        ver, lamb, br = getN21NG(rates, ver, lamb, br, sim.reactionfn)
-    # %% N2+ Meinel band
-    if "n2meinel" in sim.reacreq:
-        ver, lamb, br = getN2meinel(rates, ver, lamb, br, sim.reactionfn)
-    # %% N2 2P (after Vallance Jones, 1974)
-    if "n22pg" in sim.reacreq:
-        ver, lamb, br = getN22PG(rates, ver, lamb, br, sim.reactionfn)
-    # %% N2 1P
-    if "n21pg" in sim.reacreq:
-        ver, lamb, br = getN21PG(rates, ver, lamb, br, sim.reactionfn)
-    # %% Remove NaN wavelength entries
-    if ver is None:
-        raise ValueError("you have not selected any reactions to generate VER")
-    # %% sort by wavelength, eliminate NaN
-    lamb, ver, br = sortelimlambda(lamb, ver, br)
-    # %% assemble output
-    dfver = xarray.DataArray(data=ver, coords=[("alt_km", rates.alt_km), ("wavelength_nm", lamb)])
-
-    return dfver, ver, br
+
+    def __init__(self, reacreq, reactfn: Path):
+        R = loadreactions(reactfn)
+
+        blocks = []  # (reaction, coefficient, wavelength)
+        # %% METASTABLE
+        if "metastable" in reacreq:
+            A = R["metastable"]["A"]
+            lamb = R["metastable"]["lambda"]
+            blocks += [("no1s", A[:2], lamb[:2]), ("no1d", A[2:4], lamb[2:4]), ("noii2p", A[4:], lamb[4:])]
+        # %% PROMPT ATOMIC OXYGEN EMISSIONS
+        if "atomic" in reacreq:
+            lamb = R["atomic"]["lambda"]
+            blocks += [("po3p3p", np.ones(1), lamb[:1]), ("po3p5p", np.ones(1), lamb[1:])]
+        # %% N2 1N EMISSIONS
+        if "n21ng" in reacreq:
+            blocks.append(("p1ng", R["N2+1NG"]["scalevec"], R["N2+1NG"]["lambda"]))
+        # %% N2+ Meinel band
+        if "n2meinel" in reacreq:
+            blocks.append(("pmein", R["N2+Meinel"]["scalevec"], R["N2+Meinel"]["lambda"]))
+        # %% N2 2P (after Vallance Jones, 1974)
+        if "n22pg" in reacreq:
+            blocks.append(("p2pg", R["N2_2PG"]["scalevec"], R["N2_2PG"]["lambda"]))
+        # %% N2 1P
+        if "n21pg" in reacreq:
+            blocks.append(("p1pg", R["N2_1PG"]["scalevec"] / R["N2_1PG"]["losscoef"], R["N2_1PG"]["lambda"]))
+
+        if not blocks:
+            raise ValueError("you have not selected any reactions to generate VER")
+
+        self.reactions = [b[0] for b in blocks]
+
+        lamb = np.concatenate([b[2] for b in blocks])
+        M = np.zeros((len(blocks), lamb.size))
+        j = np.cumsum([0] + [b[1].size for b in blocks])
+        for i, (_, coef, _) in enumerate(blocks):
+            M[i, j[i]:j[i + 1]] = coef
+        # %% eliminate unused wavelengths and Einstein coeff, sort by wavelength
+        mask = np.isfinite(lamb)
+        lamb = lamb[mask]
+        M = M[:, mask]
+        i = lamb.argsort()
+
+        self.wavelength_nm = lamb[i]
+        self.matrix = np.ascontiguousarray(M[:, i])
+        self.reaction = np.repeat(np.arange(len(blocks)), np.diff(j))[mask][i]  # reaction emitting each wavelength
+
+    def __call__(self, rates: xarray.DataArray) -> Tuple[xarray.DataArray, np.ndarray, np.ndarray]:
+        """
+        rates: excitation rates, reaction is the last dimension.
+               Any leading dimensions (e.g. time x energy) are computed in the same call.
+               A NaN rate gives NaN VER at the wavelengths of its reaction only, as band by band.
+
+        ver: volume emission rate, ... x alt_km x wavelength_nm
+        br: column integrated brightness, ... x wavelength_nm
+        """
+        rdim = rates.dims[-1]
+        if rates.dims[-2] != "alt_km":
+            rates = rates.transpose(..., "alt_km", rdim)
+
+        i = rates.indexes[rdim].get_indexer(self.reactions)
+        if (i < 0).any():
+            raise KeyError(f"excitation rates are missing reactions {self.reactions}")
+
+        r = rates.values[..., i]
+        nan = np.isnan(r)
+        if nan.any():  # NaN times the zeros of other reactions would spread to all wavelengths
+            ver = np.where(nan, 0.0, r) @ self.matrix
+            ver[nan[..., self.reaction]] = np.nan
+        else:
+            ver = r @ self.matrix
+        br = altgrid(rates.alt_km.values).integrate(ver, axis=-2)
+
+        coords = {k: c for k, c in rates.coords.items() if rdim not in c.dims}
+        coords["wavelength_nm"] = self.wavelength_nm
+        dfver = xarray.DataArray(data=ver, dims=rates.dims[:-1] + ("wavelength_nm",), coords=coords)
+
+        return dfver, ver, br
+
+
+def emissionoperator(reacreq, reactfn: Path) -> EmissionOperator:
+    """
+    EmissionOperator is compiled once per requested reactions and reaction file version
+    """
+    if isinstance(reacreq, str):
+        reacreq = [reacreq]
+
+    key = (tuple(sorted(reacreq)), _reactkey(reactfn))
+
+    op = _opcache.get(key)
+    if op is None:
+        op = _opcache[key] = EmissionOperator(reacreq, reactfn)
+
+    return op
+
+
+def loadreactions(reactfn: Path) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Einstein A, lambda and Franck-Condon tables of reactfn, read from disk once per process.
+    The tables are reread only if the file modification time changes.
+
+    each band also carries its derived "scalevec" (and "losscoef" for N2 1PG),
+    the per-wavelength factor applied to the excitation rate.
+    """
+    reactfn = Path(reactfn).expanduser().resolve()
+    key = _reactkey(reactfn)
+
+    tables = _reactcache.get(key)
+    if tables is not None:
+        return tables
+
+    clearreactions(reactfn)  # drop stale copies of this file
+
+    tables = {}
+    with profiling.stage("calcemissions.loadreactions"), h5py.File(reactfn, "r") as f:
+        for band in f:
+            tables[band] = {k: f[band][k][()] for k in f[band]}
+    # %% some lambda are not 1-D!
+    for band in tables.values():
+        band["lambda"] = band["lambda"].ravel(order="F")
+    # %% derived per-band scale vectors
+    meinel = tables["N2+Meinel"]
+    for band, fc in (
+        ("N2+1NG", tables["N2+1NG"]["fc"]),
+        ("N2+Meinel", meinel["fc"] / meinel["fc"].sum()),  # normalize, special to this case
+        ("N2_2PG", tables["N2_2PG"]["fc"]),
+    ):
+        tables[band]["scalevec"] = bandscale(tables[band]["A"], fc)
+
+    pg1 = tables["N2_1PG"]
+    tau1PG = 1 / np.nansum(pg1["A"], axis=1)
+    """
+    solve for base concentration
+    confac=[1.66;1.56;1.31;1.07;.77;.5;.33;.17;.08;.04;.02;.004;.001];  %Cartwright, 1973b, stop at nuprime==12
+    Gattinger and Vallance Jones 1974
+    confac=array([1.66,1.86,1.57,1.07,.76,.45,.25,.14,.07,.03,.01,.004,.001])
+    """
+    consfac = pg1["fc"] / pg1["fc"].sum()  # normalize
+    pg1["losscoef"] = (consfac / tau1PG).sum()
+    pg1["scalevec"] = (pg1["A"] * consfac[:, None]).ravel(order="F")  # for clarity (verified with matlab)
+
+    _reactcache[key] = tables
+
+    return tables
+
+
+def clearreactions(reactfn: Path = None):
+    """
+    forget in-memory reaction tables of reactfn, or of all files if reactfn is None
+    """
+    if reactfn is None:
+        _reactcache.clear()
+        _opcache.clear()
+        return
+
+    fn = str(Path(reactfn).expanduser().resolve())
+    for key in [k for k in _reactcache if k[0] == fn]:
+        del _reactcache[key]
+    for key in [k for k in _opcache if k[1][0] == fn]:
+        del _opcache[key]
+
+
+def _reactkey(reactfn: Path) -> Tuple[str, int]:
+    reactfn = Path(reactfn).expanduser().resolve()
+    return str(reactfn), reactfn.stat().st_mtime_ns
 
 
 def getMetastable(rates, ver: np.ndarray, lamb, br, reactfn: Path):
-    with h5py.File(reactfn, "r") as f:
-        A = f["/metastable/A"][:]
-        lambnew = f["/metastable/lambda"].value.ravel(order="F")  # some are not 1-D!
+    R = loadreactions(reactfn)["metastable"]
+    A = R["A"]
 
     """
     concatenate along the reaction dimension, axis=-1
     """
     vnew = np.concatenate(
         (
-            A[:2] * rates.loc[..., "no1s"].values[:, None],
-            A[2:4] * rates.loc[..., "no1d"].values[:, None],
-            A[4:] * rates.loc[..., "noii2p"].values[:, None],
+            A[:2] * rates.loc[..., "no1s"].values[..., None],
+            A[2:4] * rates.loc[..., "no1d"].values[..., None],
+            A[4:] * rates.loc[..., "noii2p"].values[..., None],
         ),
         axis=-1,
     )
 
-    assert vnew.shape == (rates.shape[0], A.size)
+    assert vnew.shape == rates.shape[:-1] + (A.size,)
 
-    return catvl(rates.alt_km, ver, vnew, lamb, lambnew, br)
+    return catvl(rates.alt_km, ver, vnew, lamb, R["lambda"], br)
 
 
 def getAtomic(rates, ver, lamb, br, reactfn):
     """ prompt atomic emissions (nm)
     844.6 777.4
     """
-    with h5py.File(reactfn, "r") as f:
-        lambnew = f["/atomic/lambda"].value.ravel(order="F")  # some are not 1-D!
+    lambnew = loadreactions(reactfn)["atomic"]["lambda"]
 
     vnew = np.concatenate((rates.loc[..., "po3p3p"].values[..., None], rates.loc[..., "po3p5p"].values[..., None]), axis=-1,)
 
@@ -96,59 +244,31 @@ def getN21NG(rates, ver, lamb, br, reactfn):
     """
     excitation Franck-Condon factors (derived from Vallance Jones, 1974)
     """
-    with h5py.File(str(reactfn), "r", libver="latest") as f:
-        A = f["/N2+1NG/A"].value
-        lambdaA = f["/N2+1NG/lambda"].value.ravel(order="F")
-        franckcondon = f["/N2+1NG/fc"].value
+    R = loadreactions(reactfn)["N2+1NG"]
 
-    return doBandTrapz(A, lambdaA, franckcondon, rates.loc[..., "p1ng"], lamb, ver, rates.alt_km, br)
+    return bandver(R["scalevec"], R["lambda"], rates.loc[..., "p1ng"], lamb, ver, rates.alt_km, br)
 
 
 def getN2meinel(rates, ver, lamb, br, reactfn):
-    with h5py.File(str(reactfn), "r", libver="latest") as f:
-        A = f["/N2+Meinel/A"].value
-        lambdaA = f["/N2+Meinel/lambda"].value.ravel(order="F")
-        franckcondon = f["/N2+Meinel/fc"].value
-    # normalize
-    franckcondon = franckcondon / franckcondon.sum()  # special to this case
+    R = loadreactions(reactfn)["N2+Meinel"]
 
-    return doBandTrapz(A, lambdaA, franckcondon, rates.loc[..., "pmein"], lamb, ver, rates.alt_km, br)
+    return bandver(R["scalevec"], R["lambda"], rates.loc[..., "pmein"], lamb, ver, rates.alt_km, br)
 
 
 def getN22PG(rates, ver, lamb, br, reactfn):
     """ from Benesch et al, 1966a """
-    with h5py.File(str(reactfn), "r", libver="latest") as f:
-        A = f["/N2_2PG/A"].value
-        lambdaA = f["/N2_2PG/lambda"].value.ravel(order="F")
-        franckcondon = f["/N2_2PG/fc"].value
+    R = loadreactions(reactfn)["N2_2PG"]
 
-    return doBandTrapz(A, lambdaA, franckcondon, rates.loc[..., "p2pg"], lamb, ver, rates.alt_km, br)
+    return bandver(R["scalevec"], R["lambda"], rates.loc[..., "p2pg"], lamb, ver, rates.alt_km, br)
 
 
 def getN21PG(rates, ver, lamb, br, reactfn):
 
-    with h5py.File(str(reactfn), "r", libver="latest") as fid:
-        A = fid["/N2_1PG/A"].value
-        lambnew = fid["/N2_1PG/lambda"].value.ravel(order="F")
-        franckcondon = fid["/N2_1PG/fc"].value
-
-    tau1PG = 1 / np.nansum(A, axis=1)
-    """
-    solve for base concentration
-    confac=[1.66;1.56;1.31;1.07;.77;.5;.33;.17;.08;.04;.02;.004;.001];  %Cartwright, 1973b, stop at nuprime==12
-    Gattinger and Vallance Jones 1974
-    confac=array([1.66,1.86,1.57,1.07,.76,.45,.25,.14,.07,.03,.01,.004,.001])
-    """
-
-    consfac = franckcondon / franckcondon.sum()  # normalize
-    losscoef = (consfac / tau1PG).sum()
-    N01pg = rates.loc[..., "p1pg"] / losscoef
+    R = loadreactions(reactfn)["N2_1PG"]
 
-    scalevec = (A * consfac[:, None]).ravel(order="F")  # for clarity (verified with matlab)
+    N01pg = rates.loc[..., "p1pg"] / R["losscoef"]
 
-    vnew = scalevec[None, None, :] * N01pg.values[..., None]
-
-    return catvl(rates.alt_km, ver, vnew, lamb, lambnew, br)
+    return bandver(R["scalevec"], R["lambda"], N01pg, lamb, ver, rates.alt_km, br)
 
 
 def doBandTrapz(Aein, lambnew, fc, kin, lamb, ver, z, br):
@@ -160,18 +280,24 @@ def doBandTrapz(Aein, lambnew, fc, kin, lamb, ver, z, br):
     axis 1 is bottom state vib level (nu'')
     there is a Franck-Condon parameter (variable fc) for each upper state nu'
     """
+    return bandver(bandscale(Aein, fc), lambnew, kin, lamb, ver, z, br)
+
+
+def bandscale(Aein: np.ndarray, fc: np.ndarray) -> np.ndarray:
     tau = 1 / np.nansum(Aein, axis=1)
 
-    scalevec = (Aein * tau[:, None] * fc[:, None]).ravel(order="F")
+    return (Aein * tau[:, None] * fc[:, None]).ravel(order="F")
+
 
-    vnew = scalevec[None, None, :] * kin.values[..., None]
+def bandver(scalevec, lambnew, kin, lamb, ver, z, br):
+    vnew = scalevec * kin.values[..., None]
 
     return catvl(z, ver, vnew, lamb, lambnew, br)
 
 
 def catvl(z, ver, vnew, lamb, lambnew, br):
     """
-    trapz integrates over altitude axis, axis = -2
+    trapezoid integration over altitude axis, axis = -2
     concatenate over reaction dimension, axis = -1
 
     br: column integrated brightness
@@ -179,13 +305,13 @@ def catvl(z, ver, vnew, lamb, lambnew, br):
     ver: volume emission rate  [photons / cm^-3 s^-3 ...]
     """
     if ver is not None:
-        br = np.concatenate((br, np.trapz(vnew, z, axis=-2)), axis=-1)  # must come first!
+        br = np.concatenate((br, altgrid(z).integrate(vnew, axis=-2)), axis=-1)  # must come first!
         ver = np.concatenate((ver, vnew), axis=-1)
         lamb = np.concatenate((lamb, lambnew))
     else:
         ver = vnew.copy(order="F")
         lamb = lambnew.copy()
-        br = np.trapz(ver, z, axis=-2)
+        br = altgrid(z).integrate(ver, axis=-2)
 
     return ver, lamb, br
 
@@ -197,12 +323,12 @@ def sortelimlambda(lamb, ver, br):
     mask = np.isfinite(lamb)
     ver = ver[..., mask]
     lamb = lamb[mask]
-    br = br[:, mask]
+    br = br[..., mask]
     # %% sort by lambda
     lambSortInd = lamb.argsort()  # lamb is made piecemeal and is overall non-monotonic
 
     return (
         lamb[lambSortInd],
         ver[..., lambSortInd],
-        br[:, lambSortInd],
+        br[..., lambSortInd],
     )  # sort by wavelength ascending order
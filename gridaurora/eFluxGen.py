@@ -39,23 +39,35 @@ def maxwellian(E: np.ndarray, E0: np.ndarray, Q0: np.ndarray) -> Tuple[np.ndarra
     return Phi, Q
 
 
-def fluxgen(E, E0, Q0, Wbc, bl, bm, bh, Bm, Bhf, verbose: int = 0) -> tuple:
+def fluxgen(E, E0, Q0, Wbc, bl, bm, bh, Bm, Bhf, verbose: int = 0, components: bool = True) -> tuple:
+    """
+    Strickland 1993 differential number flux, for a batch of any number of parameter sets.
+    E0 is a vector, other parameters are scalar or vector the same length as E0.
+
+    components=False skips returning low, mid, hi, base and accumulates in place,
+    returning only diffnumflux, Q
+    """
+    E = np.asarray(E)
+    E0 = np.atleast_1d(E0)
 
     Wb = Wbc * E0
 
-    isimE0 = abs(E - E0).argmin()
+    isimE0 = abs(E[:, None] - E0).argmin(axis=0)
 
-    base = gaussflux(E, Wb, E0, Q0)
-    diffnumflux = base.copy()
+    if not components:
+        diffnumflux = _fluxgen_inplace(E, E0, Q0, Wb, bl, bm, bh, Bm, Bhf, isimE0)
+    else:
+        base = gaussflux(E, Wb, E0, Q0)
+        diffnumflux = base.copy()
 
-    low = letail(E, E0, Q0, bl, verbose)
-    diffnumflux += low  # intermediate result
+        low = letail(E, E0, Q0, bl, verbose)
+        diffnumflux += low  # intermediate result
 
-    mid = midtail(E, E0, bm, Bm)
-    diffnumflux += mid  # intermediate result
+        mid = midtail(E, E0, bm, Bm)
+        diffnumflux += mid  # intermediate result
 
-    hi = hitail(E, diffnumflux, isimE0, E0, Bhf, bh, verbose)
-    diffnumflux += hi
+        hi = hitail(E, diffnumflux, isimE0, E0, Bhf, bh, verbose)
+        diffnumflux += hi
 
     if verbose > 0:
         diprat(E0, diffnumflux, isimE0)
@@ -64,9 +76,53 @@ def fluxgen(E, E0, Q0, Wbc, bl, bm, bh, Bm, Bhf, verbose: int = 0) -> tuple:
     if verbose > 0:
         print("total flux Q: " + (" ".join("{:.1e}".format(q) for q in Q)))
 
+    if not components:
+        return diffnumflux, Q
+
     return np.asfortranarray(diffnumflux), low, mid, hi, base, Q
 
 
+def _fluxgen_inplace(E, E0, Q0, Wb, bl, bm, bh, Bm, Bhf, isimE0) -> np.ndarray:
+    """
+    same sum as gaussflux + letail + midtail + hitail, with one E x E0 work array
+    """
+    # %% base
+    Phi = np.empty((E.size, E0.size), order="F")
+    np.subtract(E[:, None], E0, out=Phi)
+    Phi /= Wb
+    np.square(Phi, out=Phi)
+    np.negative(Phi, out=Phi)
+    np.exp(Phi, out=Phi)
+    Phi *= Q0 / (pi ** (3 / 2) * Wb * E0)
+
+    ratio = np.empty_like(Phi)
+    np.divide(E[:, None], E0, out=ratio)
+    # multiplying by 1/0 masks is exact and much faster than ufunc where=
+    below = np.empty_like(Phi)
+    np.less_equal(E[:, None], E0, out=below)
+    above = np.empty_like(Phi)
+    np.greater_equal(E[:, None], E0, out=above)
+    work = np.empty_like(Phi)
+    # %% low energy tail
+    np.power(ratio, -bl, out=work)
+    work *= 0.4 * Q0 / (2 * pi * E0 ** 2) * np.exp(-1)
+    work *= below
+    Phi += work
+    # %% mid tail
+    np.power(ratio, bm, out=work)
+    work *= Bm
+    work *= below
+    Phi += work
+    # %% high energy tail
+    Bh = Bhf * Phi[isimE0, np.arange(E0.size)]
+    np.power(ratio, -bh, out=work)
+    work *= Bh
+    work *= above
+    Phi += work
+
+    return Phi
+
+
 def letail(E: np.ndarray, E0: float, Q0: float, bl: float, verbose: int = 0) -> np.ndarray:
     # for LET, 1<b<2
     # Bl = 8200.   #820 (typo?)
@@ -93,9 +149,7 @@ def hitail(
     """
     strickland 1993 said 0.2, but 0.145 gives better match to peak flux at 2500 = E0
     """
-    Bh = np.empty_like(E0)
-    for iE0 in np.arange(E0.size):
-        Bh[iE0] = Bhf[iE0] * diffnumflux[isimE0[iE0], iE0]  # 4100.
+    Bh = Bhf * diffnumflux[isimE0, np.arange(E0.size)]  # 4100.
     # bh = 4                   #2.9
     het = Bh * (E[:, None] / E0) ** -bh
     het[E[:, None] < E0] = 0.0
@@ -105,10 +159,10 @@ def hitail(
 
 
 def diprat(E0: np.ndarray, arc: np.ndarray, isimE0: np.ndarray):
-    dipratio = np.empty_like(E0)
-    for iE0 in np.arange(E0.size):
-        idip = arc[: isimE0[iE0], iE0].argmin(axis=0)
-        dipratio[iE0] = arc[idip, iE0] / arc[isimE0[iE0], iE0]
+    j = np.arange(E0.size)
+    # minimum below the peak
+    idip = np.where(np.arange(arc.shape[0])[:, None] < isimE0, arc, np.inf).argmin(axis=0)
+    dipratio = arc[idip, j] / arc[isimE0, j]
 
     print("dipratio: " + (" ".join(f"{d:0.2f}" for d in dipratio)))
     # if not all(0.2<dipratio<0.5):
@@ -120,6 +174,24 @@ def gaussflux(E, Wb, E0, Q0):
     return Qc * np.exp(-(((E[:, None] - E0) / Wb) ** 2))
 
 
+def EllisonRamaty(E: np.ndarray, E0: np.ndarray, gamma: np.ndarray, kappa: np.ndarray, C0: np.ndarray):
+    E, E0, gamma, kappa, C0 = dimhandler(E, E0, gamma, kappa, C0)
+    # %% do work
+    return C0 * E[:, None] ** (-gamma) * np.exp(-(((E[:, None] - E0) / np.gradient(E)[:, None]) ** kappa))
+
+
+def dimhandler(E, E0, gamma, kappa, C0=None):
+    # %% lite input validation
+    E = np.asarray(E)
+    E0 = np.atleast_1d(E0)
+    gamma = np.atleast_1d(gamma)
+    kappa = np.atleast_1d(kappa)
+    C0 = np.atleast_1d(C0)
+    assert E.ndim == E0.ndim == gamma.ndim == kappa.ndim == C0.ndim == 1, "E0, gamma, kappa, C0: scalar or vector. E: vector"
+
+    return E, E0, gamma, kappa, C0
+
+
 def writeh5(h5fn: Path, Phi: np.ndarray, E, fp):
     if h5fn:
         with h5py.File(h5fn, "w") as f:
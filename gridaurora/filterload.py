@@ -1,17 +1,21 @@
 #!/usr/bin/env python
 from pathlib import Path
+from collections import OrderedDict
+import hashlib
 import logging
 import numpy as np
-from scipy.interpolate import interp1d
 import h5py
 import xarray
+from typing import Any, Callable, Dict, List, Sequence, Tuple
 
 # consider atmosphere
-try:
-    import lowtran
-except ImportError as e:
-    logging.error(f"failure to load LOWTRAN, proceeding without atmospheric absorption model.  {e}")
-    lowtran = None
+from . import lowtrantable
+from .interpolate import interplinear
+from .responselib import ResponseLibrary, responselibrary
+from . import profiling
+
+if lowtrantable.lowtran is None:
+    logging.error("failure to load LOWTRAN, proceeding without atmospheric absorption model.")
 """
 gets optical System Transmittance from filter, sensor window, and QE spec.
 Michael Hirsch 2014
@@ -22,72 +26,579 @@ QE: http://www.andor.com/pdfs/specifications/Andor_iXon_Ultra_897_Specifications
 window: http://www.andor.com/pdfs/specifications/Andor_Camera_Windows_Supplementary_Specifications.pdf
 """
 
+SYSTEMT_CACHESIZE = 32  # maximum number of getSystemT results kept in memory
+# getSystemT result and its systemweight arrays by name
+_systemTcache: "OrderedDict[tuple, Tuple[xarray.Dataset, Dict[str, np.ndarray]]]" = OrderedDict()
+_systemTstats = {"hits": 0, "misses": 0}
 
-def getSystemT(newLambda, bg3fn: Path, windfn: Path, qefn: Path, obsalt_km, zenang_deg, verbose: bool = False) -> xarray.Dataset:
 
+@profiling.timed("filterload.getSystemT")
+def getSystemT(
+    newLambda,
+    bg3fn: Path,
+    windfn: Path,
+    qefn: Path,
+    obsalt_km,
+    zenang_deg,
+    verbose: bool = False,
+    cache: bool = True,
+    lib: ResponseLibrary = None,
+    zentol_deg: float = None,
+) -> xarray.Dataset:
+    """
+    system transmittance is the same for every beam of a simulation,
+    so results are kept in a bounded LRU cache keyed on wavelength grid, input files and geometry.
+    cache=False: compute afresh from the files and LOWTRAN, using and filling neither this nor the curve cache.
+    lib: response library (or its .npy file) serving the curves of bg3fn, windfn, qefn it was built from,
+         instead of reading those HDF5 files
+    zentol_deg: LOWTRAN table stored zenith angles this close [deg] answer the request, default lowtrantable.ZENTOL_DEG
+    """
     bg3fn = Path(bg3fn).expanduser()
     windfn = Path(windfn).expanduser()
     qefn = Path(qefn).expanduser()
+    lib = _library(lib)
 
     newLambda = np.asarray(newLambda)
-    # %% atmospheric absorption
-    if lowtran is not None:
-        c1 = {
-            "model": 5,
-            "h1": obsalt_km,
-            "angle": zenang_deg,
-            "wlshort": newLambda[0],
-            "wllong": newLambda[-1],
-        }
-        if verbose:
-            print("loading LOWTRAN7 atmosphere model...")
-        atmT = lowtran.transmittance(c1)["transmission"].squeeze()
-        try:
-            atmTcleaned = atmT.values.squeeze()
-            atmTcleaned[atmTcleaned == 0] = np.spacing(1)  # to avoid log10(0)
-            fwl = interp1d(atmT.wavelength_nm, np.log(atmTcleaned), axis=0)
-        except AttributeError:  # problem with lowtran
-            fwl = interp1d(newLambda, np.log(np.ones_like(newLambda)), kind="linear")
+
+    if not cache:
+        return _getSystemT(newLambda, bg3fn, windfn, qefn, obsalt_km, zenang_deg, verbose, False, lib, zentol_deg)
+
+    T = _cachedsystemT(newLambda, bg3fn, windfn, qefn, obsalt_km, zenang_deg, verbose, lib, zentol_deg)[0]
+
+    return T.copy(deep=True)  # caller may modify
+
+
+@profiling.timed("filterload.systemweight")
+def systemweight(
+    newLambda,
+    bg3fn: Path,
+    windfn: Path,
+    qefn: Path,
+    obsalt_km,
+    zenang_deg,
+    name: str = "sys",
+    verbose: bool = False,
+    lib: ResponseLibrary = None,
+    zentol_deg: float = None,
+) -> np.ndarray:
+    """
+    getSystemT(...)[name] as read-only array, to weight a spectrum and sum over wavelength.
+    Transmission outside a curve's datasheet range (NaN) is 0, as the NaN-skipping sum of xarray.
+    Computed once per cached getSystemT result, not per beam.
+    """
+    bg3fn = Path(bg3fn).expanduser()
+    windfn = Path(windfn).expanduser()
+    qefn = Path(qefn).expanduser()
+
+    T, weights = _cachedsystemT(
+        np.asarray(newLambda), bg3fn, windfn, qefn, obsalt_km, zenang_deg, verbose, _library(lib), zentol_deg
+    )
+
+    w = weights.get(name)
+    if w is None:
+        w = weights[name] = _readonly(np.nan_to_num(T[name].values, nan=0.0))
+
+    return w
+
+
+def _cachedsystemT(
+    newLambda: np.ndarray,
+    bg3fn: Path,
+    windfn: Path,
+    qefn: Path,
+    obsalt_km,
+    zenang_deg,
+    verbose: bool,
+    lib: ResponseLibrary,
+    zentol_deg: float = None,
+) -> Tuple[xarray.Dataset, Dict[str, np.ndarray]]:
+    """
+    shared cache entry, not to be modified
+    """
+    key = (
+        hashlib.sha1(np.ascontiguousarray(newLambda).tobytes()).hexdigest(),
+        newLambda.shape,
+        newLambda.dtype.str,
+        _sourcekey(bg3fn, lib),
+        _sourcekey(windfn, lib),
+        _sourcekey(qefn, lib),
+        float(obsalt_km),
+        float(zenang_deg),
+        _zentol(zentol_deg),
+    )
+
+    entry = _systemTcache.get(key)
+    if entry is not None:
+        _systemTstats["hits"] += 1
+        _systemTcache.move_to_end(key)
     else:
-        fwl = interp1d(newLambda, np.log(np.ones_like(newLambda)), kind="linear")
+        _systemTstats["misses"] += 1
+        T = _getSystemT(newLambda, bg3fn, windfn, qefn, obsalt_km, zenang_deg, verbose, lib=lib, zentol_deg=zentol_deg)
+        entry = _systemTcache[key] = (T, {})
+        while len(_systemTcache) > SYSTEMT_CACHESIZE:
+            _systemTcache.popitem(last=False)
 
-    atmTinterp = np.exp(fwl(newLambda))
-    if not np.isfinite(atmTinterp).all():
-        logging.error("problem in computing LOWTRAN atmospheric attenuation, results are suspect!")
-    # %% BG3 filter
-    with h5py.File(bg3fn, "r") as f:
-        try:
-            assert isinstance(f["/T"], h5py.Dataset), "we only allow one transmission curve per file"  # simple legacy behavior
-            fbg3 = interp1d(f["/wavelength"], np.log(f["/T"]), kind="linear", bounds_error=False)
-        except KeyError:
-            raise KeyError("could not find /wavelength in {}".format(f.filename))
-
-        try:
-            fname = f["T"].attrs["name"].item()
-            if isinstance(fname, bytes):
-                fname = fname.decode("utf8")
-        except KeyError:
-            fname = ""
-    # %% camera window
-    with h5py.File(windfn, "r") as f:
-        fwind = interp1d(f["/lamb"], np.log(f["/T"]), kind="linear")
-    # %% quantum efficiency
-    with h5py.File(qefn, "r") as f:
-        fqe = interp1d(f["/lamb"], np.log(f["/QE"]), kind="linear")
-    # %% collect results into DataArray
+    return entry
+
+
+def systemTcacheinfo() -> dict:
+    return {**_systemTstats, "size": len(_systemTcache), "maxsize": SYSTEMT_CACHESIZE}
+
+
+def clearsystemTcache():
+    _systemTcache.clear()
+    _systemTstats["hits"] = _systemTstats["misses"] = 0
+
+
+def _filekey(fn: Path) -> tuple:
+    fn = fn.resolve()
+    return str(fn), fn.stat().st_mtime_ns
+
+
+def _sourcekey(fn: Path, lib: ResponseLibrary) -> tuple:
+    curve = lib.fromfile(fn) if lib is not None else None
+    return _filekey(fn) if curve is None else lib.key + (curve,)
+
+
+def _zentol(zentol_deg: float) -> float:
+    return float(lowtrantable.ZENTOL_DEG if zentol_deg is None else zentol_deg)
+
+
+def _library(lib) -> ResponseLibrary:
+    return lib if lib is None or isinstance(lib, ResponseLibrary) else responselibrary(lib)
+
+
+@profiling.timed("filterload.getSystemTgeom")
+def getSystemTgeom(
+    newLambda, bg3fn: Path, windfn: Path, qefn: Path, obsalt_km, zenang_deg, verbose: bool = False
+) -> xarray.Dataset:
+    """
+    getSystemT for many observer geometries at once.
+    obsalt_km, zenang_deg: scalar or array, broadcast against each other, e.g. alt[:, None], zen for all combinations
+
+    filter, window, qe are computed once, atm, sysNObg3 and sys are geometry x wavelength
+    """
+    bg3fn = Path(bg3fn).expanduser()
+    windfn = Path(windfn).expanduser()
+    qefn = Path(qefn).expanduser()
+
+    newLambda = np.asarray(newLambda)
+    obsalt_km, zenang_deg = (a.ravel() for a in np.broadcast_arrays(obsalt_km, zenang_deg))
+
+    S = TransmittanceStack(newLambda)
+    fname = S.addfilter(bg3fn, "filter")[1]
+    S.addwindow(windfn)
+    S.addqe(qefn)
+    logatm = np.array([_logatmT(S.wavelength_nm, h, z, verbose) for h, z in zip(obsalt_km, zenang_deg)])
 
     T = xarray.Dataset(
         {
-            "filter": ("wavelength_nm", np.exp(fbg3(newLambda))),
-            "window": ("wavelength_nm", np.exp(fwind(newLambda))),
-            "qe": ("wavelength_nm", np.exp(fqe(newLambda))),
-            "atm": ("wavelength_nm", atmTinterp),
+            "filter": ("wavelength_nm", S("filter")),
+            "window": ("wavelength_nm", S("window")),
+            "qe": ("wavelength_nm", S("qe")),
+            "atm": (("geometry", "wavelength_nm"), np.exp(logatm)),
         },
+        coords={"wavelength_nm": newLambda, "obsalt_km": ("geometry", obsalt_km), "zenang_deg": ("geometry", zenang_deg)},
+        attrs={"filename": fname},
+    )
+
+    T["sysNObg3"] = (("geometry", "wavelength_nm"), np.exp(logatm + S.log("window", "qe")))
+    T["sys"] = (("geometry", "wavelength_nm"), np.exp(logatm + S.log("window", "qe", "filter")))
+
+    return T
+
+
+@profiling.timed("filterload.getSystemTfilters")
+def getSystemTfilters(
+    newLambda,
+    filterfns: Sequence[Path],
+    windfn: Path,
+    qefn: Path,
+    obsalt_km,
+    zenang_deg,
+    spectrum=None,
+    verbose: bool = False,
+    lib: ResponseLibrary = None,
+) -> xarray.Dataset:
+    """
+    getSystemT for many candidate filters at once.
+    window, qe, atm and sysNObg3 are computed once, filterT and sys are filter x wavelength.
+    The filter transmission is "filterT" here, since "filter" is the dimension, labelled by filter name.
+
+    filterfns: filter transmission files, each as bg3fn of getSystemT, with distinct filter names or file names
+    spectrum: optional VER (... x wavelength_nm) or br (wavelength_nm) on the newLambda grid,
+              adds "brightness", the spectrum weighted by sys and summed over wavelength, ... x filter
+    lib: as getSystemT, for the filter, window and QE files
+    """
+    windfn = Path(windfn).expanduser()
+    qefn = Path(qefn).expanduser()
+    newLambda = np.asarray(newLambda)
+    lib = _library(lib)
+
+    S = TransmittanceStack(newLambda)
+    names: List[str] = []
+    for fn in filterfns:
+        fn = Path(fn).expanduser()
+        # named by the filter name in the file, or the file name if another filter has that name
+        curve = lib.fromfile(fn) if lib is not None else None
+        name = lib.meta[curve]["name"] if curve is not None else _logfilterT(S.wavelength_nm, fn)[1]
+        if not name or name in names:
+            name = fn.stem
+        if name in names:
+            raise ValueError(f"{fn}: filter name {name} is already used by another of filterfns")
+        names.append(S.addfilter(fn, name, lib)[0])
+    S.addwindow(windfn, lib=lib)
+    S.addqe(qefn, lib=lib)
+    S.addatm(obsalt_km, zenang_deg, verbose=verbose)
+
+    T = xarray.Dataset(
+        {
+            "filterT": (("filter", "wavelength_nm"), np.array([S(n) for n in names])),
+            "window": ("wavelength_nm", S("window")),
+            "qe": ("wavelength_nm", S("qe")),
+            "atm": ("wavelength_nm", S("atm")),
+            "sysNObg3": ("wavelength_nm", S("window", "qe", "atm")),
+            "sys": (("filter", "wavelength_nm"), np.array([S(n, "window", "qe", "atm") for n in names])),
+        },
+        coords={"filter": names, "wavelength_nm": newLambda, "filename": ("filter", [str(fn) for fn in filterfns])},
+    )
+
+    if spectrum is not None:
+        T["brightness"] = filterbrightness(T, spectrum)
+
+    return T
+
+
+def filterbrightness(T: xarray.Dataset, spectrum) -> xarray.DataArray:
+    """
+    spectrum weighted by each filter's system transmission, summed over wavelength, in one matrix product.
+    Transmission outside a filter's datasheet range (NaN) counts as 0, as the NaN-skipping sum of xarray.
+
+    T: from getSystemTfilters
+    spectrum: VER (... x wavelength_nm) or br (wavelength_nm) on the T.wavelength_nm grid
+
+    returns ... x filter
+    """
+    if isinstance(spectrum, xarray.DataArray):
+        spectrum = spectrum.transpose(..., "wavelength_nm")
+        dims = spectrum.dims[:-1]
+        coords = {k: c for k, c in spectrum.coords.items() if "wavelength_nm" not in c.dims}
+        spectrum = spectrum.values
+    else:
+        spectrum = np.asarray(spectrum)
+        dims = tuple(f"dim_{i}" for i in range(spectrum.ndim - 1))
+        coords = {}
+
+    if spectrum.shape[-1] != T.wavelength_nm.size:
+        raise ValueError(f"spectrum has {spectrum.shape[-1]} wavelengths, transmission has {T.wavelength_nm.size}")
+
+    coords["filter"] = T.filter
+    sys = np.nan_to_num(T["sys"].values, nan=0.0)
+    return xarray.DataArray(spectrum @ sys.T, dims=dims + ("filter",), coords=coords)
+
+
+def _getSystemT(
+    newLambda: np.ndarray,
+    bg3fn: Path,
+    windfn: Path,
+    qefn: Path,
+    obsalt_km,
+    zenang_deg,
+    verbose: bool,
+    cache: bool = True,
+    lib: ResponseLibrary = None,
+    zentol_deg: float = None,
+) -> xarray.Dataset:
+
+    S = TransmittanceStack(newLambda, cache)
+    fname = S.addfilter(bg3fn, "filter", lib)[1]
+    S.addwindow(windfn, lib=lib)
+    S.addqe(qefn, lib=lib)
+    S.addatm(obsalt_km, zenang_deg, verbose=verbose, zentol_deg=zentol_deg)
+    # %% collect results into DataArray
+
+    T = xarray.Dataset(
+        {k: ("wavelength_nm", S(k)) for k in ("filter", "window", "qe", "atm")},
         coords={"wavelength_nm": newLambda},
         attrs={"filename": fname},
     )
 
-    T["sysNObg3"] = T["window"] * T["qe"] * T["atm"]
-    T["sys"] = T["sysNObg3"] * T["filter"]
+    T["sysNObg3"] = ("wavelength_nm", S("window", "qe", "atm"))
+    T["sys"] = ("wavelength_nm", S("window", "qe", "atm", "filter"))
 
     return T
+
+
+class TransmittanceStack:
+    """
+    transmittance curves on one wavelength grid, composed by name, e.g.
+
+    S = TransmittanceStack(newLambda)
+    S.addfilter(bg3fn, "bg3")
+    S.addwindow(windfn)
+    S.addqe(qefn)
+    S.addatm(obsalt_km, zenang_deg)
+    S.add("ND1", 0.1)
+    sys = S("bg3", "window", "qe", "atm", "ND1")
+
+    Curves are held as log transmittance and products are sums of logs, so long stacks don't underflow.
+    Curves read from files or LOWTRAN are cached per wavelength grid across stacks (unless cache=False),
+    and each composed product is cached in the stack, so after warm-up a stack costs one exp over wavelength.
+    """
+
+    def __init__(self, newLambda, cache: bool = True):
+        self.wavelength_nm = np.asarray(newLambda, dtype=float)
+        self.cache = cache
+        self._log: Dict[str, np.ndarray] = {}
+        self._products: Dict[tuple, np.ndarray] = {}
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._log)
+
+    def add(self, name: str, T) -> str:
+        """
+        T: scalar or curve on the wavelength grid, e.g. 0.1 for a neutral density 1 filter
+        """
+        T = np.broadcast_to(np.asarray(T, dtype=float), self.wavelength_nm.shape)
+        with np.errstate(divide="ignore"):
+            return self.addlog(name, np.log(T))
+
+    def addlog(self, name: str, logT: np.ndarray) -> str:
+        self._log[name] = logT
+        self._products = {k: v for k, v in self._products.items() if name not in k}
+        return name
+
+    def addfilter(self, fn: Path, name: str = None, lib: ResponseLibrary = None) -> Tuple[str, str]:
+        """
+        filter transmission file as bg3fn of getSystemT, named by the filter name in the file if name not given
+        lib: response library serving the curve of fn, if built from it, instead of reading fn
+
+        returns name in stack, filter name in file
+        """
+        curve = lib.fromfile(fn) if lib is not None else None
+        if curve is None:
+            logT, fname = _logfilterT(self.wavelength_nm, Path(fn).expanduser(), self.cache)
+        else:
+            logT, fname = lib.log(curve, self.wavelength_nm), lib.meta[curve]["name"]
+
+        if not name:
+            name = fname if fname else Path(fn).stem
+        return self.addlog(name, logT), fname
+
+    def addwindow(self, fn: Path, name: str = "window", lib: ResponseLibrary = None) -> str:
+        logT = self._fromlibrary(lib, fn)
+        if logT is None:
+            logT = _logwindowT(self.wavelength_nm, Path(fn).expanduser(), self.cache)
+        return self.addlog(name, logT)
+
+    def addqe(self, fn: Path, name: str = "qe", lib: ResponseLibrary = None) -> str:
+        logT = self._fromlibrary(lib, fn)
+        if logT is None:
+            logT = _logqeT(self.wavelength_nm, Path(fn).expanduser(), self.cache)
+        return self.addlog(name, logT)
+
+    def addatm(
+        self, obsalt_km: float, zenang_deg: float, name: str = "atm", verbose: bool = False, zentol_deg: float = None
+    ) -> str:
+        """
+        zentol_deg: as getSystemT
+        """
+        return self.addlog(name, _logatmT(self.wavelength_nm, obsalt_km, zenang_deg, verbose, self.cache, zentol_deg))
+
+    def addlibrary(self, lib, curve: str, name: str = None) -> str:
+        """
+        curve of a responselib.ResponseLibrary, no file reads once the library is loaded
+        """
+        return self.addlog(name if name else curve, lib.log(curve, self.wavelength_nm))
+
+    def _fromlibrary(self, lib: ResponseLibrary, fn: Path) -> np.ndarray:
+        """
+        window or QE curve of fn from lib, None if lib was not built from fn.
+        As for the file, the wavelength grid must lie within the curve's range.
+        """
+        curve = lib.fromfile(fn) if lib is not None else None
+        if curve is None:
+            return None
+
+        lo, hi = lib.meta[curve]["range_nm"]
+        if self.wavelength_nm.min() < lo or self.wavelength_nm.max() > hi:
+            raise ValueError(f"{curve} of {lib.key[0]} covers {lo}..{hi} nm, not all requested wavelengths")
+
+        return lib.log(curve, self.wavelength_nm)
+
+    def log(self, *names: str) -> np.ndarray:
+        """
+        log transmittance of the stack of named curves
+        """
+        key = tuple(sorted(names))
+        logT = self._products.get(key)
+        if logT is None:
+            logT = np.zeros(self.wavelength_nm.shape)
+            for n in key:
+                logT = logT + self._log[n]
+            logT.flags.writeable = False
+            self._products[key] = logT
+
+        return logT
+
+    def __call__(self, *names: str) -> np.ndarray:
+        """
+        transmittance of the stack of named curves
+        """
+        return np.exp(self.log(*names))
+
+
+CURVE_CACHESIZE = 128  # maximum number of log transmittance curves kept in memory
+# log transmittance curves, keyed on wavelength grid and source (file and modification time, or geometry)
+_curvecache: "OrderedDict[tuple, Any]" = OrderedDict()
+
+
+def clearcurvecache():
+    _curvecache.clear()
+
+
+def _cachedcurve(newLambda: np.ndarray, source: tuple, compute: Callable, cache: bool = True):
+    if not cache:
+        return compute()
+
+    key = _curvekey(newLambda, source)
+
+    c = _curvecache.get(key)
+    if c is None:
+        c = compute()
+        _storecurve(key, c)
+    else:
+        _curvecache.move_to_end(key)
+
+    return c
+
+
+def _storecurve(key: tuple, c):
+    _curvecache[key] = c
+    while len(_curvecache) > CURVE_CACHESIZE:
+        _curvecache.popitem(last=False)
+
+
+def _curvekey(newLambda: np.ndarray, source: tuple) -> tuple:
+    return (hashlib.sha1(np.ascontiguousarray(newLambda).tobytes()).hexdigest(), newLambda.shape) + source
+
+
+def _atmT(newLambda: np.ndarray, obsalt_km, zenang_deg, verbose: bool = False) -> np.ndarray:
+    """
+    atmospheric absorption
+    """
+    return np.exp(_logatmT(np.asarray(newLambda), obsalt_km, zenang_deg, verbose))
+
+
+def _logatmT(
+    newLambda: np.ndarray, obsalt_km, zenang_deg, verbose: bool = False, cache: bool = True, zentol_deg: float = None
+) -> np.ndarray:
+    """
+    only LOWTRAN results are cached, so LOWTRAN or a table appearing later is used
+    """
+    zentol_deg = _zentol(zentol_deg)
+    key = _curvekey(newLambda, ("atm", float(obsalt_km), float(zenang_deg), zentol_deg))
+
+    logT = _curvecache.get(key) if cache else None
+    if logT is not None:
+        _curvecache.move_to_end(key)
+    else:
+        logT, found = _lowtranlogT(newLambda, obsalt_km, zenang_deg, verbose, zentol_deg)
+        _readonly(logT)
+        if found and cache:
+            _storecurve(key, logT)
+
+    return logT
+
+
+@profiling.timed("filterload.lowtran")
+def _lowtranlogT(
+    newLambda: np.ndarray, obsalt_km, zenang_deg, verbose: bool = False, zentol_deg: float = None
+) -> Tuple[np.ndarray, bool]:
+    if verbose:
+        print("loading LOWTRAN7 atmosphere model...")
+    try:
+        wl, atmT = lowtrantable.transmittance(newLambda[0], newLambda[-1], obsalt_km, zenang_deg, zentol_deg=zentol_deg)
+    except AttributeError:  # problem with lowtran
+        atmT = None
+
+    if atmT is not None:
+        atmTcleaned = atmT.copy()
+        atmTcleaned[atmTcleaned == 0] = np.spacing(1)  # to avoid log10(0)
+        logT = interplinear(wl, np.log(atmTcleaned), newLambda)
+    else:
+        logT = np.zeros(newLambda.shape)  # transmittance 1
+
+    if not np.isfinite(logT).all():
+        logging.error("problem in computing LOWTRAN atmospheric attenuation, results are suspect!")
+
+    return logT, atmT is not None
+
+
+def _filterT(newLambda: np.ndarray, bg3fn: Path) -> tuple:
+    """
+    BG3 filter (or any other filter), and its name
+    """
+    logT, fname = _logfilterT(np.asarray(newLambda), bg3fn)
+
+    return np.exp(logT), fname
+
+
+def _logfilterT(newLambda: np.ndarray, bg3fn: Path, cache: bool = True) -> tuple:
+    def compute():
+        with h5py.File(bg3fn, "r") as f:
+            try:
+                assert isinstance(f["/T"], h5py.Dataset), "we only allow one transmission curve per file"  # simple legacy behavior
+                with np.errstate(divide="ignore"):
+                    logT = interplinear(f["/wavelength"][()], np.log(f["/T"][()]), newLambda, bounds="nan")
+            except KeyError:
+                raise KeyError("could not find /wavelength in {}".format(f.filename))
+
+            try:
+                fname = f["T"].attrs["name"].item()
+                if isinstance(fname, bytes):
+                    fname = fname.decode("utf8")
+            except KeyError:
+                fname = ""
+
+        return _readonly(logT), fname
+
+    return _cachedcurve(newLambda, ("filter",) + _filekey(bg3fn), compute, cache)
+
+
+def _windowT(newLambda: np.ndarray, windfn: Path) -> np.ndarray:
+    """
+    camera window
+    """
+    return np.exp(_logwindowT(np.asarray(newLambda), windfn))
+
+
+def _logwindowT(newLambda: np.ndarray, windfn: Path, cache: bool = True) -> np.ndarray:
+    def compute():
+        with h5py.File(windfn, "r") as f:
+            logT = interplinear(f["/lamb"][()], np.log(f["/T"][()]), newLambda)
+        return _readonly(logT)
+
+    return _cachedcurve(newLambda, ("window",) + _filekey(windfn), compute, cache)
+
+
+def _qeT(newLambda: np.ndarray, qefn: Path) -> np.ndarray:
+    """
+    quantum efficiency
+    """
+    return np.exp(_logqeT(np.asarray(newLambda), qefn))
+
+
+def _logqeT(newLambda: np.ndarray, qefn: Path, cache: bool = True) -> np.ndarray:
+    def compute():
+        with h5py.File(qefn, "r") as f:
+            logT = interplinear(f["/lamb"][()], np.log(f["/QE"][()]), newLambda)
+        return _readonly(logT)
+
+    return _cachedcurve(newLambda, ("qe",) + _filekey(qefn), compute, cache)
+
+
+def _readonly(x: np.ndarray) -> np.ndarray:
+    x.flags.writeable = False
+    return x
@@ -0,0 +1,157 @@
+"""
+library of precipitation spectra over a multidimensional parameter grid.
+
+The grid is the cartesian product of the given parameter vectors, evaluated in memory-bounded chunks
+and written to HDF5 one spectrum per row, with the grid axes as parameter index.
+
+example:
+buildfluxlib("lib.h5", E, "strickland", {"E0": np.logspace(2.5, 4, 50), "Q0": 1e12, "Wbc": [0.25, 0.5, 1.0],
+             "bl": 0.8, "bm": [2.5, 3], "bh": 4.0, "Bm": [2000, 4000, 6500], "Bhf": [0.125, 0.3, 0.5]})
+
+lib = FluxLibrary("lib.h5")
+i, Phi = lib.nearest(E0=3000, Wbc=0.4, bm=2.7, Bm=3000, Bhf=0.2)
+"""
+from pathlib import Path
+import logging
+import numpy as np
+import h5py
+from typing import Dict, Sequence, Tuple
+from .eFluxGen import maxwellian, fluxgen, EllisonRamaty
+
+# parameter names, in argument order of each model function
+MODELS = {
+    "maxwellian": ("E0", "Q0"),
+    "strickland": ("E0", "Q0", "Wbc", "bl", "bm", "bh", "Bm", "Bhf"),
+    "ellisonramaty": ("E0", "gamma", "kappa", "C0"),
+}
+
+
+def buildfluxlib(
+    h5fn: Path,
+    E: np.ndarray,
+    model: str,
+    params: Dict[str, Sequence[float]],
+    chunksize: int = 10000,
+    compression: str = "gzip",
+):
+    """
+    E: energy bins [eV]
+    model: maxwellian, strickland or ellisonramaty
+    params: scalar or vector for each parameter of the model
+    chunksize: number of spectra computed and written at a time
+    """
+    model = model.lower()
+    names = MODELS[model]
+    if set(params) != set(names):
+        raise ValueError(f"{model} needs parameters {names}")
+
+    E = np.asarray(E, dtype=float)
+    axes = [np.atleast_1d(np.asarray(params[k], dtype=float)) for k in names]
+    shape = tuple(a.size for a in axes)
+    N = int(np.prod(shape))
+    logging.info(f"{model} flux library: {N} spectra x {E.size} energy bins")
+
+    with h5py.File(Path(h5fn).expanduser(), "w") as f:
+        d = f.create_dataset("/E", data=E)
+        d.attrs["unit"] = "eV"
+
+        g = f.create_group("/params")
+        g.attrs["model"] = model
+        g.attrs["names"] = list(names)
+        for k, a in zip(names, axes):
+            g.create_dataset(k, data=a)
+
+        rows = min(N, max(1, 2 ** 20 // (8 * E.size)))  # about 1 MB chunks
+        d = f.create_dataset("/diffnumflux", shape=(N, E.size), dtype=float, chunks=(rows, E.size), compression=compression)
+        d.attrs["unit"] = "cm^-2 s^-1 eV^-1"
+        d.attrs["size"] = "Nspectra x NEnergy, spectra in C order of the /params grid"
+
+        for i in range(0, N, chunksize):
+            j = min(i + chunksize, N)
+            p = [a[k] for a, k in zip(axes, np.unravel_index(np.arange(i, j), shape))]
+            d[i:j, :] = _evaluate(model, E, p).T
+
+
+def _evaluate(model: str, E: np.ndarray, p: Sequence[np.ndarray]) -> np.ndarray:
+    """
+    returns E x N spectra
+    """
+    if model == "maxwellian":
+        return maxwellian(E, *p)[0]
+    elif model == "strickland":
+        return fluxgen(E, *p, components=False)[0]
+    elif model == "ellisonramaty":
+        return EllisonRamaty(E, *p)
+
+    raise ValueError(f"unknown model {model}")
+
+
+class FluxLibrary:
+    """
+    reads a library written by buildfluxlib.
+    Parameter grid and energy are held in memory, spectra are read from disk on request.
+    """
+
+    def __init__(self, h5fn: Path):
+        self.fn = Path(h5fn).expanduser()
+
+        with h5py.File(self.fn, "r") as f:
+            self.E = f["/E"][:]
+            self.model = f["/params"].attrs["model"]
+            self.names = [n.decode("utf8") if isinstance(n, bytes) else str(n) for n in f["/params"].attrs["names"]]
+            self.axes = {k: f["/params"][k][:] for k in self.names}
+
+        self.shape = tuple(a.size for a in self.axes.values())
+
+    def __len__(self) -> int:
+        return int(np.prod(self.shape))
+
+    def params(self, index) -> Dict[str, np.ndarray]:
+        """
+        parameter values of spectra index (scalar or vector)
+        """
+        i = np.unravel_index(index, self.shape)
+        return {k: self.axes[k][j] for k, j in zip(self.names, i)}
+
+    def spectra(self, index) -> np.ndarray:
+        """
+        spectra index (scalar or vector), returns N x E
+        """
+        index = np.atleast_1d(index)
+        u, inv = np.unique(index, return_inverse=True)  # HDF5 needs increasing indices
+
+        with h5py.File(self.fn, "r") as f:
+            return f["/diffnumflux"][u, :][inv]
+
+    def nearest(self, **query) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        nearest grid point to query parameters (scalar or broadcastable vectors).
+        For an axis not given, the first grid value of that axis is taken.
+        Distance is per axis, logarithmic for axes of positive values.
+
+        returns index, N x E spectra
+        """
+        unknown = set(query) - set(self.names)
+        if unknown:
+            raise ValueError(f"{self.model} has no parameters {unknown}")
+
+        q = np.broadcast_arrays(*(np.asarray(query.get(k, self.axes[k][0]), dtype=float) for k in self.names))
+        i = [_nearestaxis(self.axes[k], v) for k, v in zip(self.names, q)]
+        index = np.ravel_multi_index(i, self.shape)
+
+        return index, self.spectra(index)
+
+
+def _nearestaxis(axis: np.ndarray, v: np.ndarray) -> np.ndarray:
+    if axis.size == 1:
+        return np.zeros(v.shape, dtype=int)
+
+    order = axis.argsort()
+    a = axis[order]
+    if (a > 0).all():
+        a = np.log(a)
+        v = np.log(np.clip(v, np.finfo(float).tiny, None))
+
+    i = np.clip(np.searchsorted((a[1:] + a[:-1]) / 2, v), 0, a.size - 1)
+
+    return order[i]
@@ -0,0 +1,66 @@
+"""
+forward model: differential number flux spectra -> VER and column brightness, via eigenprofiles.
+
+ver = Peigen @ (phi * dE)   alt x N
+br = w @ ver                N
+
+with dE the energy bin widths from EKpcolor and w the trapezoid weights along altitude.
+Both bin widths and altitude weights are folded into the matrices once, so each call is one matrix multiply.
+"""
+import numpy as np
+import xarray
+from typing import Tuple
+from .altgrid import altgrid
+
+
+class ForwardModel:
+    """
+    Peigen: alt x energy eigenprofiles, VER per unit differential number flux (e.g. from arcexcite.getTranscar)
+    EKpcolor: energy bin edges [eV], one more than the number of energy bins
+    z: altitude [km], taken from Peigen.alt_km if Peigen is an xarray.DataArray
+    dtype: np.float32 halves memory traffic for large batches
+    """
+
+    def __init__(self, Peigen, EKpcolor: np.ndarray, z: np.ndarray = None, dtype=np.float64):
+        if isinstance(Peigen, xarray.DataArray):
+            z = Peigen.alt_km.values if z is None else z
+            Peigen = Peigen.values
+
+        Peigen = np.asarray(Peigen, dtype=float)
+        dE = np.diff(np.asarray(EKpcolor, dtype=float))
+        if dE.size != Peigen.shape[1]:
+            raise ValueError(f"{Peigen.shape[1]} energy bins need {Peigen.shape[1] + 1} bin edges EKpcolor")
+        if z is None or len(z) != Peigen.shape[0]:
+            raise ValueError("altitude z must match first dimension of Peigen")
+
+        grid = altgrid(z)
+
+        self.z = grid.z
+        self.dtype = dtype
+        self.A = np.ascontiguousarray(Peigen * dE, dtype=dtype)  # alt x energy
+        self.b = np.ascontiguousarray(grid.w @ (Peigen * dE), dtype=dtype)  # energy
+
+    def __call__(self, phi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        phi: differential number flux, energy x N (or energy)
+
+        returns ver: alt x N, br: N
+        """
+        phi = np.asarray(phi, dtype=self.dtype)
+
+        return self.A @ phi, self.b @ phi
+
+    def brightness(self, phi: np.ndarray) -> np.ndarray:
+        """
+        column brightness only, without forming VER
+        """
+        return self.b @ np.asarray(phi, dtype=self.dtype)
+
+
+def forwardmodel(
+    Peigen, phi: np.ndarray, EKpcolor: np.ndarray, z: np.ndarray = None, dtype=np.float64
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    one-shot ForwardModel, see ForwardModel for repeated calls with the same eigenprofiles
+    """
+    return ForwardModel(Peigen, EKpcolor, z, dtype)(phi)
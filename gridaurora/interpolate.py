@@ -0,0 +1,156 @@
+"""
+linear interpolation for transmission curves, used in log space by filterload, in place of scipy interp1d.
+
+Results are identical to scipy interp1d(kind="linear") on float64 data: both use the arithmetic of numpy.interp.
+Points outside the source grid follow an explicit bounds policy:
+  "error": raise ValueError, as interp1d(bounds_error=True), the interp1d default
+  "nan": NaN, as interp1d(bounds_error=False), used for filter curves not spanning the wavelength grid
+  "edge": end values, as numpy.interp
+
+one curve:
+logT = interplinear(wavelength, np.log(T), newLambda, bounds="nan")
+
+many curves sharing source and target grids, bracketing indices found once:
+f = Interpolator(wavelength, newLambda, bounds="nan")
+logT = f(np.log(T))  # T: Ncurves x Nwavelength
+"""
+import numpy as np
+
+BOUNDS = ("error", "nan", "edge")
+
+
+class Interpolator:
+    """
+    x: source grid, sorted here (stable, as interp1d) unless assume_sorted
+    xnew: target points
+    bounds: policy for xnew outside x, one of BOUNDS
+    """
+
+    def __init__(self, x, xnew, bounds: str = "error", assume_sorted: bool = False):
+        x, order = _sortgrid(x, assume_sorted)
+        xnew = np.asarray(xnew, dtype=float)
+        self.shape = xnew.shape
+        xnew = xnew.ravel()
+        below, above = _outside(x, xnew, bounds)
+
+        j = np.searchsorted(x, xnew, side="right") - 1  # x[j] <= xnew < x[j+1]
+        np.clip(j, 0, x.size - 2, out=j)
+
+        if order is None:
+            order = np.arange(x.size)
+
+        self.bounds = bounds
+        self.j0 = order[j]  # indices into the caller's, unsorted, y
+        self.j1 = order[j + 1]
+        self.first = order[0]
+        self.last = order[-1]
+        self.h = x[j + 1] - x[j]
+        self.h[self.h == 0] = 1.0  # repeated end points, only where the result is overridden below
+        self.dx = xnew - x[j]
+        self.dx1 = xnew - x[j + 1]
+        # sparse special cases, as index arrays
+        atlast = xnew == x[-1]
+        self.atlast = np.flatnonzero(atlast)
+        self.atnode = np.flatnonzero((xnew == x[j]) & ~atlast)
+        self.nanx = np.flatnonzero(np.isnan(xnew))
+        self.below = np.flatnonzero(below)
+        self.above = np.flatnonzero(above)
+
+    def __call__(self, y) -> np.ndarray:
+        """
+        y: ... x Nx curves on the source grid
+
+        returns ... x xnew.shape
+        """
+        y = np.asarray(y, dtype=float)
+
+        y0 = y.take(self.j0, axis=-1)
+        y1 = y.take(self.j1, axis=-1)
+        if np.isfinite(y).all():
+            out = y1 - y0
+            out /= self.h
+            out *= self.dx
+            out += y0
+        else:
+            out = self._nonfinite(y0, y1)
+
+        out[..., self.atnode] = y0[..., self.atnode]
+        out[..., self.atlast] = y[..., self.last, None]
+        out[..., self.nanx] = np.nan
+
+        if self.bounds == "nan":
+            out[..., self.below] = np.nan
+            out[..., self.above] = np.nan
+        elif self.bounds == "edge":
+            out[..., self.below] = y[..., self.first, None]
+            out[..., self.above] = y[..., self.last, None]
+
+        return out.reshape(y.shape[:-1] + self.shape)
+
+    def _nonfinite(self, y0: np.ndarray, y1: np.ndarray) -> np.ndarray:
+        """
+        y containing inf (log of zero transmission) or NaN: when a point's neighbors give NaN,
+        try from the upper point, then equal neighbors, as numpy.interp
+        """
+        with np.errstate(invalid="ignore"):
+            slope = (y1 - y0) / self.h
+            out = slope * self.dx + y0
+
+            bad = np.isnan(out)
+            out[bad] = (slope * self.dx1 + y1)[bad]
+            bad &= np.isnan(out) & (y0 == y1)
+            out[bad] = y0[bad]
+
+        return out
+
+
+def interplinear(x, y, xnew, bounds: str = "error", assume_sorted: bool = False) -> np.ndarray:
+    """
+    one curve y on source grid x, at xnew.
+    Single curves are fastest through the binary search of numpy.interp: an Interpolator pays off only when reused.
+    """
+    x, order = _sortgrid(x, assume_sorted)
+    y = np.asarray(y, dtype=float).ravel()
+    if y.size != x.size:
+        raise ValueError(f"x and y sizes differ: {x.size} != {y.size}")
+    if order is not None:
+        y = y[order]
+    xnew = np.asarray(xnew, dtype=float)
+    below, above = _outside(x, xnew, bounds)
+
+    out = np.asarray(np.interp(xnew, x, y))
+    if bounds == "nan":
+        out[below | above] = np.nan
+
+    return out
+
+
+def _sortgrid(x, assume_sorted: bool) -> tuple:
+    """
+    x as float vector in ascending order, and the stable sort order (None if x was already sorted)
+    """
+    x = np.asarray(x, dtype=float).ravel()
+    if x.size < 2:
+        raise ValueError("need at least 2 points to interpolate")
+
+    if assume_sorted or (x[1:] >= x[:-1]).all():
+        return x, None
+
+    order = np.argsort(x, kind="mergesort")
+
+    return x[order], order
+
+
+def _outside(x: np.ndarray, xnew: np.ndarray, bounds: str) -> tuple:
+    if bounds not in BOUNDS:
+        raise ValueError(f"bounds must be one of {BOUNDS}")
+
+    below = xnew < x[0]
+    above = xnew > x[-1]
+    if bounds == "error":
+        if below.any():
+            raise ValueError(f"A value ({xnew[below].min()}) in x_new is below the interpolation range ({x[0]}).")
+        if above.any():
+            raise ValueError(f"A value ({xnew[above].max()}) in x_new is above the interpolation range ({x[-1]}).")
+
+    return below, above
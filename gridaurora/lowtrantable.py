@@ -0,0 +1,229 @@
+"""
+persistent table of LOWTRAN atmospheric transmittance.
+
+LOWTRAN is run at most once per (observer altitude, zenith angle, wavelength range).
+Results are stored in HDF5 under CACHEDIR, one file per wavelength range with one group per observer altitude.
+Requests within ZENTOL_DEG of stored zenith angles are answered by interpolation between the bracketing
+stored angles (linear in log transmittance), without running LOWTRAN.
+"""
+from pathlib import Path
+from contextlib import contextmanager
+import os
+import shutil
+import time
+import logging
+import numpy as np
+import h5py
+from typing import Callable, Tuple, Sequence
+
+try:
+    import lowtran
+except ImportError:
+    lowtran = None
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+CACHEDIR = Path(os.environ.get("GRIDAURORA_CACHE", "~/.cache/gridaurora")).expanduser() / "lowtran"
+ZENTOL_DEG = 0.5  # maximum distance [deg] to nearest stored zenith angle to answer from table
+LOCK_TIMEOUT_S = 60.0  # wait at most this long for another process writing the table
+
+
+def transmittance(
+    wlshort: float,
+    wllong: float,
+    obsalt_km: float,
+    zenang_deg: float,
+    cachedir: Path = None,
+    zentol_deg: float = None,
+    compute: Callable = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    returns wavelength_nm, transmittance on the LOWTRAN wavelength grid
+
+    compute: function of LOWTRAN input dict returning (wavelength_nm, transmittance), default runs LOWTRAN.
+    If LOWTRAN is not available and the table cannot answer, returns None, None.
+    """
+    zentol_deg = ZENTOL_DEG if zentol_deg is None else zentol_deg
+    fn = tablefn(wlshort, wllong, cachedir)
+    # %% table lookup
+    zen, wl, T = loadtable(fn, obsalt_km)
+    if zen.size > 0 and abs(zen - zenang_deg).min() <= zentol_deg:
+        return wl, interpzenith(zen, T, zenang_deg)
+    # %% miss
+    if compute is None:
+        if lowtran is None:
+            return None, None
+        compute = _lowtran
+
+    logging.info(f"LOWTRAN obsalt {obsalt_km} km  zenith angle {zenang_deg} deg  {wlshort}..{wllong} nm")
+    c1 = {"model": 5, "h1": obsalt_km, "angle": zenang_deg, "wlshort": wlshort, "wllong": wllong}
+    wl, t = compute(c1)
+    try:
+        appendtable(fn, obsalt_km, zenang_deg, wl, t)
+    except OSError as e:
+        logging.warning(f"could not store LOWTRAN result in {fn}  {e}")
+
+    return wl, t
+
+
+def buildtable(
+    wlshort: float,
+    wllong: float,
+    obsalt_km: Sequence[float],
+    zenang_deg: Sequence[float],
+    cachedir: Path = None,
+    compute: Callable = None,
+):
+    """
+    precompute the table on a grid of observer altitude x zenith angle
+    """
+    for h in np.atleast_1d(obsalt_km):
+        for z in np.atleast_1d(zenang_deg):
+            transmittance(wlshort, wllong, h, z, cachedir, 0.0, compute)
+
+
+def tablefn(wlshort: float, wllong: float, cachedir: Path = None) -> Path:
+    cachedir = CACHEDIR if cachedir is None else Path(cachedir).expanduser()
+    return cachedir / f"lowtran_{wlshort:.3f}-{wllong:.3f}nm.h5"
+
+
+def loadtable(fn: Path, obsalt_km: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    returns zenith angles (sorted ascending), wavelength, transmittance (zenith x wavelength)
+    stored for this observer altitude
+    """
+    if not fn.is_file():
+        return np.empty(0), None, None
+
+    try:
+        with h5py.File(fn, "r") as f:
+            g = f.get(_altgroup(obsalt_km))
+            if g is None:
+                return np.empty(0), None, None
+
+            zen = g["zenang_deg"][:]
+            wl = g["wavelength_nm"][:]
+            T = g["T"][:]
+    except OSError as e:  # e.g. locked by a writer not using appendtable: a table miss
+        logging.warning(f"could not read LOWTRAN table {fn}  {e}")
+        return np.empty(0), None, None
+
+    i = zen.argsort()
+
+    return zen[i], wl, T[i, :]
+
+
+def appendtable(fn: Path, obsalt_km: float, zenang_deg: float, wl: np.ndarray, T: np.ndarray):
+    """
+    safe with several processes filling the same table, e.g. the beam workers of getTranscar:
+    writers take turns through a lock file, and each writes a copy of the table that then replaces it,
+    so readers see the table before or after an append, never one being written.
+    """
+    fn.parent.mkdir(parents=True, exist_ok=True)
+
+    with _locked(fn):
+        tmp = fn.with_name(f"{fn.name}.{os.getpid()}.tmp")
+        try:
+            if fn.is_file():
+                shutil.copyfile(fn, tmp)
+
+            with h5py.File(tmp, "a") as f:
+                name = _altgroup(obsalt_km)
+                if name not in f:
+                    g = f.create_group(name)
+                    g.attrs["obsalt_km"] = obsalt_km
+                    g.create_dataset("zenang_deg", shape=(0,), maxshape=(None,), dtype=float)
+                    g.create_dataset("wavelength_nm", data=wl)
+                    g.create_dataset("T", shape=(0, wl.size), maxshape=(None, wl.size), dtype=float, chunks=(1, wl.size))
+
+                g = f[name]
+                if g["wavelength_nm"].shape != wl.shape or not np.allclose(g["wavelength_nm"][:], wl):
+                    raise ValueError(f"{fn} {name}: LOWTRAN wavelength grid changed, delete the table to rebuild")
+
+                if (g["zenang_deg"][:] == zenang_deg).any():  # stored meanwhile by another process
+                    return
+
+                N = g["zenang_deg"].size
+                g["zenang_deg"].resize((N + 1,))
+                g["T"].resize((N + 1, wl.size))
+                g["zenang_deg"][N] = zenang_deg
+                g["T"][N, :] = T
+
+            os.replace(tmp, fn)
+        finally:
+            if tmp.is_file():
+                tmp.unlink()
+
+
+@contextmanager
+def _locked(fn: Path):
+    """
+    exclusive operating system lock on a lock file next to fn.
+    The lock goes with the holder's open file, so a killed process leaves no stale lock to break.
+    """
+    lock = fn.with_name(fn.name + ".lock")
+    fd = os.open(lock, os.O_CREAT | os.O_RDWR)
+    try:
+        tic = time.monotonic()
+        while not _trylock(fd):
+            if time.monotonic() - tic > LOCK_TIMEOUT_S:
+                raise TimeoutError(f"{lock} held for more than {LOCK_TIMEOUT_S} s")
+            time.sleep(0.05)
+
+        try:
+            yield
+        finally:
+            _unlock(fd)
+    finally:
+        os.close(fd)
+
+
+def _trylock(fd: int) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except OSError:  # held by another process
+        return False
+
+    return True
+
+
+def _unlock(fd: int):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+def interpzenith(zen: np.ndarray, T: np.ndarray, zenang_deg: float) -> np.ndarray:
+    """
+    linear interpolation of log transmittance between bracketing zenith angles,
+    nearest stored angle outside the table
+    """
+    i = np.searchsorted(zen, zenang_deg)
+    if i == zen.size:
+        return T[-1]
+    if i == 0 or zen[i] == zenang_deg:
+        return T[i]
+
+    w = (zenang_deg - zen[i - 1]) / (zen[i] - zen[i - 1])
+    logT = np.log(np.clip(T[[i - 1, i]], np.spacing(1), None))
+
+    return np.exp((1 - w) * logT[0] + w * logT[1])
+
+
+def _altgroup(obsalt_km: float) -> str:
+    return f"h{obsalt_km:.3f}km"
+
+
+def _lowtran(c1: dict) -> Tuple[np.ndarray, np.ndarray]:
+    T = lowtran.transmittance(c1)["transmission"].squeeze()
+
+    return T.wavelength_nm.values, T.values.squeeze()
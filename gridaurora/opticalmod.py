@@ -1,24 +1,51 @@
 #!/usr/bin/env python
 import logging
+import numpy as np
 import xarray
-from .filterload import getSystemT
+from .filterload import systemweight
+from . import profiling
 
 
-def opticalModel(sim, ver: xarray.DataArray, obsAlt_km: float, zenithang: float):
+@profiling.timed("opticalmod.opticalModel")
+def opticalModel(sim, ver: xarray.DataArray, obsAlt_km: float, zenithang: float, out: np.ndarray = None):
     """
     ver: Nalt x Nwavelength
+    out: preallocated Nalt output, e.g. Peigen[:, iEn], written in place and returned without xarray labels
+    sim.responselib, if present: response library (.npy) serving the filter, window and QE curves, see responselib
 
+    returns VER weighted by optical system transmission and summed over wavelength, Nalt
     """
     assert isinstance(ver, xarray.DataArray)
-    # %% get system optical transmission T
-    optT = getSystemT(ver.wavelength_nm, sim.bg3fn, sim.windowfn, sim.qefn, obsAlt_km, zenithang)
-    # %% first multiply VER by T, THEN sum overall wavelengths
+    # %% get system optical transmission T, 0 outside the filter datasheet range
     if sim.opticalfilter == "bg3":
-        VERgray = (ver * optT["sys"].values[None, :]).sum("wavelength_nm")
+        name = "sys"
     elif sim.opticalfilter == "none":
-        VERgray = (ver * optT["sysNObg3"].values[None, :]).sum("wavelength_nm")
+        name = "sysNObg3"
     else:
         logging.warning(f"unknown OpticalFilter type: {sim.opticalfilter}" "   falling back to using no filter at all")
-        VERgray = (ver * optT["sysNObg3"].values[None, :]).sum("wavelength_nm")
+        name = "sysNObg3"
+
+    lib = getattr(sim, "responselib", None)
+    T = systemweight(ver.wavelength_nm.values, sim.bg3fn, sim.windowfn, sim.qefn, obsAlt_km, zenithang, name, lib=lib)
+    # %% first multiply VER by T, THEN sum overall wavelengths
+    dims = [d for d in ver.dims if d != "wavelength_nm"]
+    VERgray = filteredver(ver.transpose(..., "wavelength_nm").values, T, out)
+    if out is not None:
+        return out
+
+    return xarray.DataArray(VERgray, coords={d: ver.coords[d] for d in dims if d in ver.coords}, dims=dims)
+
+
+def filteredver(ver: np.ndarray, T: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    """
+    ver: ... x Nwavelength, NaN counts as no emission, as the NaN-skipping sum this replaces
+    T: Nwavelength transmission, finite (see filterload.systemweight)
+
+    multiply by T and sum over wavelength as one matrix-vector product, without a VER-sized temporary
+    unless ver has NaN
+    """
+    nan = np.isnan(ver)
+    if nan.any():
+        ver = np.where(nan, 0.0, ver)
 
-    return VERgray
+    return np.matmul(ver, T, out=out)
@@ -0,0 +1,50 @@
+"""
+streaming emission model: excitation rates are pulled one time block at a time from a reader,
+so only one block of rates and VER is in memory however long the simulation.
+
+reader: iterable, or callable returning an iterable, of excitation rate blocks,
+        each a time x alt_km x reaction xarray.DataArray (as transcarread.readexcrates "excitation")
+
+example:
+for t, ver, br in emissionstream(lambda: timeblocks(rates, 100), sim):
+    ...
+"""
+import numpy as np
+import xarray
+from typing import Callable, Iterable, Iterator, Tuple, Union
+from .calcemissions import emissionoperator
+
+
+def emissionstream(
+    reader: Union[Callable[[], Iterable[xarray.DataArray]], Iterable[xarray.DataArray]], sim, blocksize: int = None
+) -> Iterator[Tuple[np.datetime64, xarray.DataArray, np.ndarray]]:
+    """
+    sim: needs reacreq, reactionfn as for calcemissions
+    blocksize: split blocks from reader into at most this many times
+
+    yields per time: time, ver alt_km x wavelength_nm, br wavelength_nm
+    """
+    if not sim.reacreq:
+        return
+
+    op = emissionoperator(sim.reacreq, sim.reactionfn)
+
+    for block in reader() if callable(reader) else reader:
+        if "time" not in block.dims:
+            block = block.expand_dims("time")
+
+        for rates in timeblocks(block, blocksize) if blocksize else (block,):
+            ver, _, br = op(rates.transpose("time", ...))
+            for i, t in enumerate(ver.time.values):
+                yield t, ver[i], br[i]
+
+
+def timeblocks(rates: xarray.DataArray, blocksize: int) -> Iterator[xarray.DataArray]:
+    """
+    consecutive blocks of at most blocksize times from time x ... rates
+    """
+    if blocksize < 1:
+        raise ValueError("blocksize must be at least 1")
+
+    for i in range(0, rates.time.size, blocksize):
+        yield rates.isel(time=slice(i, i + blocksize))
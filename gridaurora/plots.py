@@ -209,16 +209,21 @@ def niceTax(a):
     a.grid(True, which="both")
 
 
-def comparefilters(Ts):
+def comparefilters(T):
+    """
+    T: filter x wavelength_nm transmission, e.g. getSystemTfilters()["filterT"],
+       or a list of getSystemT results or of filter transmissions with a filename attribute
+    """
+    if isinstance(T, xarray.DataArray) and "filter" in T.dims:
+        curves = [(name, T.sel(filter=name)) for name in T.filter.values]
+    else:
+        curves = [(t.filename, t["filter"] if isinstance(t, xarray.Dataset) else t) for t in T]
+
     fg = figure()
-    axs = fg.subplots(len(Ts), 1, sharex=True, sharey=True)
+    axs = np.atleast_1d(fg.subplots(len(curves), 1, sharex=True, sharey=True))
 
-    for T, ax in zip(Ts, axs):
-        try:
-            ax.plot(T.wavelength_nm, T["filter"], label=T.filename)
-        except ValueError:  # just a plain filter
-            assert T.ndim == 1
-            ax.plot(T.wavelength_nm, T, label=T.filename)
+    for (name, c), ax in zip(curves, axs):
+        ax.plot(c.wavelength_nm, c, label=name)
 
         forbidden = [630.0, 555.7]
         permitted = [391.4, 427.8, 844.6, 777.4]
@@ -227,12 +232,12 @@ def comparefilters(Ts):
         for ln in permitted:
             ax.axvline(ln, linestyle="--", color="darkgreen", alpha=0.8)
 
-        ax.set_title(f"{T.filename}")
+        ax.set_title(f"{name}")
 
     fg.suptitle("Transmittance")
 
     ax.set_ylim((0, 1))
-    ax.set_xlim(T.wavelength_nm[[-1, 0]])
+    ax.set_xlim(c.wavelength_nm[[-1, 0]])
     ax.set_xlabel("wavelength [nm]")
 
 
@@ -0,0 +1,129 @@
+"""
+per-stage timing of the eigenprofile pipeline, off by default.
+
+from gridaurora import profiling
+profiling.enable(memory=True)
+Peigen, EKpcolor, Peigenunfilt = getTranscar(sim, obsalt_km, zenang)
+print(profiling.tojson())
+
+Each named stage records wall time, call count and, with memory=True, net bytes allocated (tracemalloc).
+Nested stages are each counted in full, e.g. "opticalmod.opticalModel" includes "filterload.systemweight".
+Stats are per process: stages run in ProcessPoolExecutor workers are not seen by the parent.
+When disabled, a stage costs one flag check.
+"""
+from functools import wraps
+from time import perf_counter
+import json
+import threading
+import tracemalloc
+from typing import Callable, Dict
+
+_enabled = False
+_memory = False
+_tracing = False  # tracemalloc started by enable()
+_lock = threading.Lock()
+_stats: Dict[str, Dict[str, float]] = {}
+
+
+class _Stage:
+    __slots__ = ("name", "tic", "mem")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.mem = tracemalloc.get_traced_memory()[0] if _memory else 0
+        self.tic = perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        sec = perf_counter() - self.tic
+        mem = tracemalloc.get_traced_memory()[0] - self.mem if _memory else 0
+
+        with _lock:
+            s = _stats.setdefault(self.name, {"calls": 0, "sec": 0.0, "bytes": 0})
+            s["calls"] += 1
+            s["sec"] += sec
+            s["bytes"] += mem
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+_null = _NullStage()
+
+
+def stage(name: str):
+    """
+    context manager timing the enclosed block as stage name
+    """
+    return _Stage(name) if _enabled else _null
+
+
+def timed(name: str) -> Callable:
+    """
+    decorator timing each call of the function as stage name
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def enable(memory: bool = False):
+    """
+    memory: also record net bytes allocated per stage, starting tracemalloc (slows the program severalfold)
+    """
+    global _enabled, _memory, _tracing
+
+    _memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _tracing = True
+    _enabled = True
+
+
+def disable():
+    global _enabled, _memory, _tracing
+
+    _enabled = False
+    _memory = False
+    if _tracing:
+        tracemalloc.stop()
+        _tracing = False
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def stats() -> Dict[str, Dict[str, float]]:
+    """
+    {stage: {"calls", "sec", "bytes"}}
+    """
+    with _lock:
+        return {k: dict(v) for k, v in _stats.items()}
+
+
+def tojson(**kwargs) -> str:
+    return json.dumps(stats(), **kwargs)
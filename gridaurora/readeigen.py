@@ -0,0 +1,106 @@
+"""
+reads eigenprofile HDF5 files written by writeeigen / EigenWriter.
+
+Eigenprofile arrays are not loaded until indexed, and then only the touched hyperslab is read from disk, e.g.
+ver = readeigen(fn)["ver"]
+ver.sel(time="2013-03-31T09:00", energy_ev=slice(1000, 5000)).values
+"""
+from pathlib import Path
+import threading
+import numpy as np
+import h5py
+import xarray
+from xarray.backends import BackendArray
+from xarray.core import indexing
+
+
+class _H5Array(BackendArray):
+    """
+    one HDF5 dataset, opened per read so the file is not held open
+    """
+
+    lock = threading.Lock()
+
+    def __init__(self, fn: Path, name: str):
+        self.fn = fn
+        self.name = name
+        with h5py.File(fn, "r") as f:
+            self.shape = f[name].shape
+            self.dtype = f[name].dtype
+
+    def __getitem__(self, key):
+        return indexing.explicit_indexing_adapter(key, self.shape, indexing.IndexingSupport.BASIC, self._getitem)
+
+    def _getitem(self, key: tuple) -> np.ndarray:
+        with self.lock, h5py.File(self.fn, "r") as f:
+            return f[self.name][key]
+
+
+def readeigen(fn: Path) -> xarray.Dataset:
+    """
+    returns lazily indexed Dataset with any of:
+    ver: time x energy_ev x alt_km x wavelength_nm
+    prod: time x energy_ev x alt_km [x reaction]
+    loss: time x energy_ev x alt_km x reaction  (loss_reaction if different from prod reactions)
+    energydeposition: time x alt_km x energy_ev
+
+    energy_ev is the lower bin edge when /Ebins holds bin edges.
+    """
+    fn = Path(fn).expanduser()
+
+    with h5py.File(fn, "r") as f:
+        ut1_unix = f["/ut1_unix"][:]
+        z = f["/altitude"][:]
+        Ebins = f["/Ebins"][:]
+        names = [k for k in ("/ver/eigenprofile", "/prod/eigenprofile", "/loss/eigenprofiles", "/energydeposition") if k in f]
+        NE = [f[k].shape[2 if k == "/energydeposition" else 1] for k in names]
+
+        coords = {
+            "time": np.datetime64("1970-01-01") + np.round(ut1_unix * 1e6).astype("timedelta64[us]"),
+            "alt_km": z,
+        }
+        if "/ver/wavelength" in f:
+            coords["wavelength_nm"] = f["/ver/wavelength"][:]
+        preact = _reactions(f, "/prod/reaction")
+        lreact = _reactions(f, "/loss/reaction")
+        if "sensorloc" in f:
+            attrs = {"sensorloc": f["/sensorloc"][:]}
+        else:
+            attrs = {}
+
+        units = {k: f[k].attrs.get("unit", "") for k in names}
+    # %% energy coordinate
+    if Ebins.ndim == 2:  # low, high, flux columns
+        Ebins = Ebins[:, 0]
+    if NE:
+        Ebins = Ebins[: NE[0]]  # bin edges: lower edge of each bin
+    coords["energy_ev"] = Ebins
+    # %% lazily indexed variables
+    if preact is not None:
+        coords["reaction"] = preact
+    lrdim = "reaction"
+    if lreact is not None and (preact is None or len(preact) != len(lreact) or (preact != lreact).any()):
+        lrdim = "loss_reaction" if preact is not None else "reaction"
+        coords[lrdim] = lreact
+
+    dims = {
+        "/ver/eigenprofile": ("ver", ("time", "energy_ev", "alt_km", "wavelength_nm")),
+        "/prod/eigenprofile": ("prod", ("time", "energy_ev", "alt_km", "reaction")),
+        "/loss/eigenprofiles": ("loss", ("time", "energy_ev", "alt_km", lrdim)),
+        "/energydeposition": ("energydeposition", ("time", "alt_km", "energy_ev")),
+    }
+
+    data = {}
+    for k in names:
+        name, dim = dims[k]
+        arr = _H5Array(fn, k)
+        data[name] = xarray.Variable(dim[: len(arr.shape)], indexing.LazilyIndexedArray(arr), attrs={"unit": units[k]})
+
+    return xarray.Dataset(data, coords=coords, attrs=attrs)
+
+
+def _reactions(f: h5py.File, name: str) -> np.ndarray:
+    if name not in f:
+        return None
+
+    return np.array([r.decode("utf8") if isinstance(r, bytes) else str(r) for r in f[name][:]])
@@ -0,0 +1,101 @@
+"""
+conservative regridding of energy spectra between bin-edge sets,
+e.g. Transcar 33 bins, extended 81 bins from loadtranscargrid, GLOW, Strickland logspace grids.
+
+The sparse (Ndst x Nsrc) matrix is built once per grid pair from the overlap of source and destination bins,
+cached, and applied to whole batches of spectra.
+
+needs scipy (pip install gridaurora[io])
+"""
+from collections import OrderedDict
+import numpy as np
+import hashlib
+from typing import Any
+
+REGRID_CACHESIZE = 32  # maximum number of regridding matrices kept in memory
+_regridcache: "OrderedDict[tuple, Any]" = OrderedDict()
+
+
+def regridmatrix(src_edges: np.ndarray, dst_edges: np.ndarray, density: bool = True):
+    """
+    src_edges, dst_edges: bin edges [eV], either a vector one longer than the number of bins,
+                          or N x 2 (low, high) per bin, which allows gaps between bins
+
+    density=True: spectra per unit energy (e.g. differential number flux cm^-2 s^-1 eV^-1)
+    density=False: spectra integrated over each bin (e.g. flux per bin)
+
+    Flux is preserved over the overlap of the two grids; source flux outside the destination grid is dropped,
+    and destination bins extending beyond the source grid receive no flux there.
+    """
+    src = _lowhigh(src_edges)
+    dst = _lowhigh(dst_edges)
+    key = (_hash(src), _hash(dst), density)
+
+    R = _regridcache.get(key)
+    if R is not None:
+        _regridcache.move_to_end(key)
+        return R
+
+    import scipy.sparse as sparse
+    # %% overlap of each destination bin with each source bin
+    overlap = np.minimum(dst[:, None, 1], src[None, :, 1]) - np.maximum(dst[:, None, 0], src[None, :, 0])
+    np.clip(overlap, 0, None, out=overlap)
+
+    if density:
+        overlap /= (dst[:, 1] - dst[:, 0])[:, None]
+    else:
+        overlap /= src[:, 1] - src[:, 0]
+
+    R = _regridcache[key] = sparse.csr_matrix(overlap)
+    while len(_regridcache) > REGRID_CACHESIZE:
+        _regridcache.popitem(last=False)
+
+    return R
+
+
+def regrid(spec: np.ndarray, src_edges: np.ndarray, dst_edges: np.ndarray, axis: int = 0, density: bool = True) -> np.ndarray:
+    """
+    spec: batch of spectra, energy along axis
+    """
+    R = regridmatrix(src_edges, dst_edges, density)
+
+    spec = np.moveaxis(np.asarray(spec), axis, 0)
+    out = R @ spec.reshape(spec.shape[0], -1)
+
+    return np.moveaxis(out.reshape((R.shape[0],) + spec.shape[1:]), 0, axis)
+
+
+def clearregrid():
+    _regridcache.clear()
+
+
+def edgesfrombins(bins) -> np.ndarray:
+    """
+    N x 2 bin edges from loadtranscargrid.makebin output (columns low, high)
+    """
+    return bins.loc[:, ["low", "high"]].values
+
+
+def edgesfromcenters(E: np.ndarray) -> np.ndarray:
+    """
+    bin edges at geometric midpoints of increasing bin centers, e.g. np.logspace grids
+    """
+    E = np.asarray(E, dtype=float)
+    mid = np.sqrt(E[:-1] * E[1:])
+
+    return np.concatenate(([E[0] ** 2 / mid[0]], mid, [E[-1] ** 2 / mid[-1]]))
+
+
+def _lowhigh(edges: np.ndarray) -> np.ndarray:
+    edges = np.asarray(edges, dtype=float)
+    if edges.ndim == 1:
+        edges = np.column_stack((edges[:-1], edges[1:]))
+
+    if edges.ndim != 2 or edges.shape[1] != 2 or (edges[:, 1] <= edges[:, 0]).any():
+        raise ValueError("bin edges must be increasing vector, or N x 2 low, high with high > low")
+
+    return edges
+
+
+def _hash(x: np.ndarray) -> str:
+    return hashlib.sha1(np.ascontiguousarray(x).tobytes()).hexdigest()
@@ -0,0 +1,216 @@
+"""
+instrument response library: filter, window and QE curves of gridaurora/precompute/*.h5,
+pre-resampled onto one fine uniform wavelength grid and stored together.
+
+Two files:
+responses.npy: Ncurves x Nwavelength log transmittance, memory-mapped when loaded
+responses.json: version, wavelength grid and per-curve name, kind, source file (path, modification time, sha1)
+                and valid range
+
+build (or python BuildResponseLibrary.py):
+buildresponselib("responses.npy", Path("gridaurora/precompute").glob("*.h5"))
+
+use:
+lib = responselibrary("responses.npy")
+T = lib("BG3", [427.8, 557.7])
+T = lib("Schott BG3", wavelength)  # also by the curve name stored in the original file
+T = getSystemT(wavelength, bg3fn, windfn, qefn, obsalt_km, zenang_deg, lib=lib)  # curves of these files from lib
+A curve stands in for its source file only while that file is unchanged, otherwise the file is read.
+"""
+from pathlib import Path
+import hashlib
+import json
+import logging
+import numpy as np
+import h5py
+from typing import Dict, Sequence, Tuple
+from .interpolate import interplinear
+
+RESPONSELIB_VERSION = 2
+WLNM = (200.0, 1200.0, 0.05)  # default grid start, stop, step [nm]
+
+# loaded libraries, keyed on (resolved path, modification time)
+_libcache: Dict[Tuple[str, int], "ResponseLibrary"] = {}
+
+
+def buildresponselib(outfn: Path, fns: Sequence[Path], wlnm: Tuple[float, float, float] = WLNM) -> Path:
+    """
+    outfn: .npy file to write, the .json header is written alongside
+    fns: curve HDF5 files, /wavelength + /T (filter), /lamb + /T (window) or /lamb + /QE (quantum efficiency).
+         Files of other layouts are skipped.
+    wlnm: start, stop, step of the common wavelength grid [nm]. Curves are linear in log transmittance between
+          the original points, so a grid containing the original wavelengths reproduces them exactly.
+    """
+    outfn = Path(outfn).expanduser().with_suffix(".npy")
+    start, stop, step = wlnm
+    N = int(round((stop - start) / step)) + 1
+    wl = start + step * np.arange(N)
+
+    curves = []
+    meta = {}
+    for fn in sorted(Path(f).expanduser() for f in fns):
+        c = _readcurve(fn)
+        if c is None:
+            logging.info(f"skipping {fn}, not a transmission curve file")
+            continue
+        w, T, kind, longname = c
+
+        with np.errstate(divide="ignore"):
+            logT = np.log(T)
+        meta[_shortname(fn)] = {
+            "row": len(curves),
+            "kind": kind,
+            "name": longname,
+            "source": fn.name,
+            "path": str(fn.resolve()),
+            "mtime_ns": fn.stat().st_mtime_ns,
+            "sha1": _filesha1(fn),
+            "range_nm": [float(w.min()), float(w.max())],
+        }
+        curves.append(interplinear(w, logT, wl, bounds="nan"))
+
+    if not curves:
+        raise ValueError("no transmission curve files given")
+
+    np.save(outfn, np.array(curves))
+    header = {"version": RESPONSELIB_VERSION, "wavelength_nm": {"start": start, "step": step, "size": N}, "curves": meta}
+    outfn.with_suffix(".json").write_text(json.dumps(header, indent=1))
+
+    return outfn
+
+
+def responselibrary(fn: Path) -> "ResponseLibrary":
+    """
+    library of fn, memory-mapped once per process and reloaded only if the file changes
+    """
+    fn = Path(fn).expanduser().resolve().with_suffix(".npy")
+    key = (str(fn), fn.stat().st_mtime_ns)
+
+    lib = _libcache.get(key)
+    if lib is None:
+        for k in [k for k in _libcache if k[0] == key[0]]:  # only one version of a library file is kept
+            del _libcache[k]
+        lib = _libcache[key] = ResponseLibrary(fn)
+
+    return lib
+
+
+class ResponseLibrary:
+    """
+    curves are served by short name (file stem, e.g. "BG3", "ixonWindowT") or by the name stored in the file
+    """
+
+    def __init__(self, fn: Path):
+        fn = Path(fn).expanduser().with_suffix(".npy")
+        header = json.loads(fn.with_suffix(".json").read_text())
+        if header["version"] != RESPONSELIB_VERSION:
+            raise ValueError(f"{fn} is version {header['version']}, expected {RESPONSELIB_VERSION}: rebuild it")
+
+        g = header["wavelength_nm"]
+        self.start = g["start"]
+        self.step = g["step"]
+        self.size = g["size"]
+
+        self.meta = header["curves"]
+        self._alias = {m["name"]: k for k, m in self.meta.items() if m["name"]}
+        self._alias.update({k: k for k in self.meta})
+        self._source = {m["path"]: k for k, m in self.meta.items()}
+        self._unchanged: Dict[Tuple[str, int], bool] = {}  # source file (path, modification time) matches its curve
+
+        fn = fn.resolve()
+        self.key = (str(fn), fn.stat().st_mtime_ns)  # identifies this version of the library
+
+        self.logT = np.load(fn, mmap_mode="r")
+        if self.logT.shape != (len(self.meta), self.size):
+            raise ValueError(f"{fn} shape {self.logT.shape} does not match its header")
+
+    @property
+    def names(self) -> list:
+        return list(self.meta)
+
+    @property
+    def wavelength_nm(self) -> np.ndarray:
+        return self.start + self.step * np.arange(self.size)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._alias
+
+    def fromfile(self, fn: Path) -> str:
+        """
+        short name of the curve built from file fn, None if fn is not a source of the library or changed since.
+        A file with another modification time still matches if its content (sha1) is the same.
+        """
+        fn = Path(fn).expanduser().resolve()
+        name = self._source.get(str(fn))
+        if name is None:
+            return None
+
+        try:
+            key = (str(fn), fn.stat().st_mtime_ns)
+        except FileNotFoundError:
+            return None
+
+        ok = self._unchanged.get(key)
+        if ok is None:
+            m = self.meta[name]
+            ok = self._unchanged[key] = key[1] == m["mtime_ns"] or _filesha1(fn) == m["sha1"]
+
+        return name if ok else None
+
+    def log(self, name: str, wavelength_nm) -> np.ndarray:
+        """
+        log transmittance of curve name at wavelength_nm, linear between grid points, NaN outside the grid
+        """
+        row = self.logT[self.meta[self._alias[name]]["row"]]
+        wavelength_nm = np.asarray(wavelength_nm, dtype=float)
+        x = (np.atleast_1d(wavelength_nm) - self.start) / self.step
+
+        i = np.clip(np.floor(x).astype(int), 0, self.size - 2)
+        f = x - i
+        y0 = row[i]
+        y1 = row[i + 1]
+        with np.errstate(invalid="ignore"):
+            d = np.where(y1 == y0, 0.0, y1 - y0)  # zero transmission on both sides stays zero
+            y = y0 + f * d
+            # next to zero transmission (log -inf), interpolate from the upper point as np.interp does
+            bad = np.isnan(y)
+            y[bad] = (y1 + (f - 1) * d)[bad]
+        y[(x < 0) | (x > self.size - 1)] = np.nan
+
+        return y.reshape(wavelength_nm.shape)
+
+    def __call__(self, name: str, wavelength_nm) -> np.ndarray:
+        """
+        transmittance of curve name at wavelength_nm
+        """
+        return np.exp(self.log(name, wavelength_nm))
+
+
+def _readcurve(fn: Path):
+    with h5py.File(fn, "r") as f:
+        if "wavelength" in f and "T" in f:
+            w, T, kind = f["/wavelength"][()], f["/T"][()], "filter"
+        elif "lamb" in f and "T" in f:
+            w, T, kind = f["/lamb"][()], f["/T"][()], "window"
+        elif "lamb" in f and "QE" in f:
+            w, T, kind = f["/lamb"][()], f["/QE"][()], "qe"
+        else:
+            return None
+
+        name = f["/T"].attrs.get("name", "") if "T" in f else ""
+
+    if isinstance(name, np.ndarray):
+        name = name.item()
+    if isinstance(name, bytes):
+        name = name.decode("utf8")
+
+    return w.ravel(), T.ravel(), kind, str(name)
+
+
+def _filesha1(fn: Path) -> str:
+    return hashlib.sha1(Path(fn).read_bytes()).hexdigest()
+
+
+def _shortname(fn: Path) -> str:
+    name = fn.stem
+    return name[: -len("transmittance")] if name.endswith("transmittance") else name
@@ -1,8 +1,14 @@
 from datetime import datetime
+from collections import OrderedDict
+import hashlib
+import numpy as np
 import astropy.units as u
-from astropy.coordinates import get_sun, EarthLocation, AltAz
+from astropy.coordinates import get_sun, EarthLocation, AltAz, ITRS
 from astropy.time import Time
-from . import totime
+from . import totime, todatetime64
+
+SZA_CACHESIZE = 16  # maximum number of solarzenithgrid results kept in memory
+_szacache: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
 
 
 def solarzenithangle(time: datetime, glat: float, glon: float, alt_m: float) -> tuple:
@@ -19,3 +25,96 @@ def solarzenithangle(time: datetime, glat: float, glon: float, alt_m: float) ->
     sunobs = sun.transform_to(AltAz(obstime=times, location=obs))
 
     return 90 - sunobs.alt.degree, sun, sunobs
+
+
+def solarzenithgrid(time, glat, glon, alt_m=0.0, precise: bool = True, cache: bool = True) -> np.ndarray:
+    """
+    solar zenith angle [deg] for many times and sites at once, e.g. over worldgrid.latlonworldgrid.
+    The sun position is computed once per time and broadcast over the sites.
+
+    time: scalar or vector of datetime, datetime64 or str
+    glat, glon: geodetic latitude, longitude [deg], broadcast against each other and alt_m
+    alt_m: altitude [m]
+    precise:
+      True: astropy sun position, within 1e-4 deg of solarzenithangle (no refraction)
+      False: low-precision analytic sun position (Astronomical Almanac), within 0.02 deg of astropy 1950-2050,
+             geocentric so alt_m is not used
+
+    returns read-only array, time x broadcast(glat, glon, alt_m) shape
+    """
+    t = np.atleast_1d(todatetime64(time)).astype("datetime64[ns]")
+    glat, glon, alt_m = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (glat, glon, alt_m)))
+
+    if not cache:
+        return _solarzenithgrid(t, glat, glon, alt_m, precise)
+
+    key = (_hash(t.view(np.int64)), _hash(glat), _hash(glon), _hash(alt_m) if precise else None, glat.shape, precise)
+
+    sza = _szacache.get(key)
+    if sza is not None:
+        _szacache.move_to_end(key)
+    else:
+        sza = _szacache[key] = _solarzenithgrid(t, glat, glon, alt_m, precise)
+        sza.flags.writeable = False
+        while len(_szacache) > SZA_CACHESIZE:
+            _szacache.popitem(last=False)
+
+    return sza
+
+
+def clearszacache():
+    _szacache.clear()
+
+
+def _solarzenithgrid(t: np.ndarray, glat: np.ndarray, glon: np.ndarray, alt_m: np.ndarray, precise: bool) -> np.ndarray:
+    lat = np.radians(glat)
+    lon = np.radians(glon)
+    # %% unit vector of local vertical, Earth-fixed
+    up = np.stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)), axis=-1)
+
+    if precise:
+        S = sunposition(t)  # time x 3
+        loc = EarthLocation.from_geodetic(glon, glat, alt_m)
+        P = np.stack([c.to_value(u.m) for c in loc.to_geocentric()], axis=-1)
+
+        v = S.reshape((t.size,) + (1,) * glat.ndim + (3,)) - P
+        cossza = (v * up).sum(axis=-1) / np.linalg.norm(v, axis=-1)
+    else:
+        ra, dec, gmst = _sunanalytic(t)
+        sh = (slice(None),) + (None,) * glat.ndim
+        H = gmst[sh] + lon - ra[sh]
+        cossza = np.sin(lat) * np.sin(dec[sh]) + np.cos(lat) * np.cos(dec[sh]) * np.cos(H)
+
+    return np.degrees(np.arccos(np.clip(cossza, -1, 1)))
+
+
+def sunposition(t: np.ndarray) -> np.ndarray:
+    """
+    Earth-fixed (ITRS) position of the sun [m], time x 3
+    """
+    times = Time(np.atleast_1d(np.asarray(t, dtype="datetime64[ns]")), scale="ut1")
+
+    return get_sun(times).transform_to(ITRS(obstime=times)).cartesian.xyz.to_value(u.m).T
+
+
+def _sunanalytic(t: np.ndarray) -> tuple:
+    """
+    low-precision sun right ascension, declination and Greenwich mean sidereal time [radians]
+    Astronomical Almanac, section C, good to 0.01 deg 1950-2050
+    """
+    n = (t - np.datetime64("2000-01-01T12:00")) / np.timedelta64(1, "D")
+
+    L = 280.460 + 0.9856474 * n
+    g = np.radians(357.528 + 0.9856003 * n)
+    lamb = np.radians(L + 1.915 * np.sin(g) + 0.020 * np.sin(2 * g))
+    eps = np.radians(23.439 - 4e-7 * n)
+
+    ra = np.arctan2(np.cos(eps) * np.sin(lamb), np.cos(lamb))
+    dec = np.arcsin(np.sin(eps) * np.sin(lamb))
+    gmst = np.radians(280.46061837 + 360.98564736629 * n)
+
+    return ra, dec, gmst
+
+
+def _hash(x: np.ndarray) -> str:
+    return hashlib.sha1(np.ascontiguousarray(x).tobytes()).hexdigest()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import xarray
+import h5py
+import pytest
+from pytest import approx
+
+pytest.importorskip("transcarread")
+from gridaurora.arcexcite import _accumbeams  # noqa: E402
+
+Ek = np.array([1000.0, 100.0, 3000.0, 300.0, 30.0])  # not in increasing order
+z = np.linspace(90, 500, 30)
+wl = np.array([427.8, 557.7, 630.0, 777.4])
+
+
+def beamver(E: float) -> tuple:
+    """
+    synthetic _beamver result of one beam, None for the beam that could not be read
+    """
+    if E == 100.0:
+        return None
+
+    ver = np.exp(-((z[:, None] - 100 - E / 50) ** 2) / 500) * np.arange(1, wl.size + 1)
+    Plambda = xarray.DataArray(ver, coords=[("alt_km", z), ("wavelength_nm", wl)])
+
+    return Plambda, z, ver.sum(axis=1), ver @ [0.1, 0.5, 0.2, 0.05], E / 1000
+
+
+def test_accumbeams(tmp_path):
+    fn = tmp_path / "ver.h5"
+    Peigen, Peigenunfilt, zz, beamsec = _accumbeams(map(beamver, Ek), Ek, Ek.size, fn)
+
+    assert zz == approx(z)
+    assert Peigen.shape == Peigenunfilt.shape == (z.size, Ek.size)
+    assert Peigen.flags.f_contiguous
+    for i, E in enumerate(Ek):
+        b = beamver(E)
+        if b is None:
+            assert (Peigen[:, i] == 0).all() and (Peigenunfilt[:, i] == 0).all()
+            assert np.isnan(beamsec[i])
+        else:
+            assert Peigen[:, i] == approx(b[3])
+            assert Peigenunfilt[:, i] == approx(b[2])
+            assert beamsec[i] == approx(E / 1000)
+    # %% spilled VER cube, in beam order
+    with h5py.File(fn, "r") as f:
+        assert f["/energy_ev"][()] == approx(Ek)
+        assert f["/alt_km"][()] == approx(z)
+        assert f["/wavelength_nm"][()] == approx(wl)
+        ver = f["/ver"][()]
+    assert ver.shape == (Ek.size, z.size, wl.size)
+    assert np.isnan(ver[1]).all()
+    for i in (0, 2, 3, 4):
+        assert ver[i] == approx(beamver(Ek[i])[0].values)
+    # %% first beam skipped
+    Peigen1 = _accumbeams(map(beamver, Ek[1:]), Ek[1:], Ek.size - 1)[0]
+    assert Peigen1 == approx(Peigen[:, 1:])
+
+    with pytest.raises(ValueError):
+        _accumbeams(iter([None, None]), Ek[:2], 2)
+
+
+def test_accumbeams_threads():
+    serial = _accumbeams(map(beamver, Ek), Ek, Ek.size)
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        parallel = _accumbeams(pool.map(beamver, Ek), Ek, Ek.size)
+
+    for s, p in zip(serial, parallel):
+        assert np.array_equal(s, p, equal_nan=True)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
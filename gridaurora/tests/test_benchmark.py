@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+"""
+performance of the numerical hot paths on synthetic, deterministic inputs (no Transcar, GLOW or LOWTRAN needed).
+
+store results per commit, then compare a later commit against them:
+pytest gridaurora/tests/test_benchmark.py --benchmark-autosave
+pytest gridaurora/tests/test_benchmark.py --benchmark-compare --benchmark-compare-fail=min:10%
+
+results are kept in .benchmarks/, named by commit.
+"""
+from pathlib import Path
+from types import SimpleNamespace
+import numpy as np
+import xarray
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+h5py = pytest.importorskip("h5py")
+
+from gridaurora import to_ut1unix  # noqa: E402
+from gridaurora.calcemissions import calcemissions  # noqa: E402
+from gridaurora.eFluxGen import fluxgen, maxwellian  # noqa: E402
+from gridaurora.ztanh import setupz  # noqa: E402
+from gridaurora.writeeigen import writeeigen  # noqa: E402
+from gridaurora.opticalmod import opticalModel  # noqa: E402
+from gridaurora import filterload, lowtrantable  # noqa: E402
+from gridaurora.interpolate import interplinear  # noqa: E402
+
+R = Path(__file__).resolve().parents[1]
+dpath = R / "precompute"
+
+reactions = ["no1s", "no1d", "noii2p", "po3p3p", "po3p5p", "p1ng", "pmein", "p2pg", "p1pg"]
+families = ["metastable", "atomic", "n21ng", "n2meinel", "n22pg", "n21pg"]
+
+
+@pytest.fixture(scope="module")
+def rates() -> xarray.DataArray:
+    """
+    33 Transcar beams x 200 altitudes x 9 reactions
+    """
+    E = np.logspace(1.7, 4.2, 33)
+    z = np.linspace(90, 1000, 200)
+    dat = np.random.default_rng(0).random((E.size, z.size, len(reactions)))
+    return xarray.DataArray(dat, coords=[("energy_ev", E), ("alt_km", z), ("reaction", reactions)])
+
+
+@pytest.fixture(scope="module")
+def strickland() -> tuple:
+    """
+    200 energy bins x 10000 parameter sets, as FluxGenerator.py
+    """
+    rng = np.random.default_rng(0)
+    N = 10000
+    E = np.logspace(2, 4.35, num=200, base=10)
+    E0 = 10 ** rng.uniform(2.5, 4, N)
+    Wbc = rng.uniform(0.25, 1.1, N)
+    bm = rng.uniform(2.5, 3, N)
+    Bm0 = rng.uniform(2000, 6500, N)
+    Bhf = rng.uniform(0.125, 0.5, N)
+    return (E, E0, 1e12, Wbc, 0.8, bm, 4.0, Bm0, Bhf)
+
+
+def test_calcemissions(benchmark, rates):
+    sim = SimpleNamespace(reacreq=families, reactionfn=dpath / "vjeinfc.h5")
+    ver, _, br = benchmark(calcemissions, rates, sim)
+
+    assert ver.shape[:2] == (33, 200)
+
+
+@pytest.fixture
+def curvecache():
+    """
+    each round starts cold, and no (synthetic) curve is left for later tests
+    """
+    filterload.clearcurvecache()
+    yield filterload.clearcurvecache
+    filterload.clearcurvecache()
+
+
+@pytest.mark.parametrize("atmosphere", [False, True], ids=["noLOWTRAN", "LOWTRANtable"])
+def test_getSystemT(benchmark, tmp_path, monkeypatch, curvecache, atmosphere):
+    """
+    file reads, interpolation and LOWTRAN table lookup of one uncached getSystemT
+    """
+    wl = np.arange(200, 1000, 0.5)
+
+    if atmosphere:  # synthetic atmosphere table standing in for LOWTRAN
+        monkeypatch.setattr(lowtrantable, "CACHEDIR", tmp_path)
+
+        def compute(c1: dict):
+            w = np.linspace(c1["wlshort"], c1["wllong"], 2000)
+            return w, np.exp(-0.3 * (400 / w) ** 4 / np.cos(np.radians(c1["angle"])))
+
+        lowtrantable.buildtable(wl[0], wl[-1], 0, [0, 10, 20], tmp_path, compute)
+    else:
+        monkeypatch.setattr(lowtrantable, "transmittance", lambda *args, **kwargs: (None, None))
+
+    fns = (dpath / "BG3transmittance.h5", dpath / "ixonWindowT.h5", dpath / "emccdQE.h5")
+    T = benchmark.pedantic(filterload.getSystemT, (wl, *fns, 0, 10.0), {"cache": False}, setup=curvecache, rounds=50)
+
+    assert (T["atm"].values < 1).all() == atmosphere
+
+
+@pytest.mark.parametrize("kernel", ["interp1d", "interplinear"])
+def test_interpolate(benchmark, kernel):
+    """
+    BG3, window and QE curves in log space onto 1600 wavelengths, as one uncached getSystemT
+    """
+    wl = np.arange(200, 1000, 0.5)
+    curves = []
+    for fn, w, T in (("BG3transmittance.h5", "wavelength", "T"), ("ixonWindowT.h5", "lamb", "T"), ("emccdQE.h5", "lamb", "QE")):
+        with h5py.File(dpath / fn, "r") as f:
+            with np.errstate(divide="ignore"):
+                curves.append((f[w][()], np.log(f[T][()])))
+
+    if kernel == "interp1d":
+        interp1d = pytest.importorskip("scipy.interpolate").interp1d
+
+        def run():
+            return [interp1d(x, y, bounds_error=False)(wl) for x, y in curves]
+
+    else:
+
+        def run():
+            return [interplinear(x, y, wl, bounds="nan") for x, y in curves]
+
+    assert len(benchmark(run)) == 3
+
+
+def test_opticalmodel(benchmark):
+    """
+    filtered VER column of one beam, 200 altitudes x 1600 wavelengths
+    """
+    wl = np.arange(200, 1000, 0.5)
+    z = np.linspace(90, 1000, 200)
+    ver = xarray.DataArray(np.random.default_rng(0).random((z.size, wl.size)), coords=[("alt_km", z), ("wavelength_nm", wl)])
+    sim = SimpleNamespace(
+        bg3fn=dpath / "BG3transmittance.h5", windowfn=dpath / "ixonWindowT.h5", qefn=dpath / "emccdQE.h5", opticalfilter="bg3"
+    )
+    Peigen = np.zeros((z.size, 33), order="F")
+
+    benchmark(opticalModel, sim, ver, 0, 0, out=Peigen[:, 0])
+
+    assert (Peigen[:, 0] > 0).all()
+
+
+def test_fluxgen(benchmark, strickland):
+    Phi = benchmark(fluxgen, *strickland, components=False)[0]
+
+    assert Phi.shape == (200, 10000)
+
+
+def test_maxwellian(benchmark, strickland):
+    E, E0 = strickland[:2]
+    Phi = benchmark(maxwellian, E, E0, 1e12)[0]
+
+    assert Phi.shape == (200, 10000)
+
+
+def test_setupz(benchmark):
+    z = benchmark(setupz, 1000, 90, 1.5, 10.575)
+
+    assert z.size == 1000
+
+
+def test_to_ut1unix(benchmark):
+    t = (np.datetime64("2013-03-31T09:00") + np.arange(1000000) * np.timedelta64(1, "s")).astype(str)
+
+    assert benchmark(to_ut1unix, t)[0] == 1364720400.0
+
+
+@pytest.mark.parametrize("compression", [None, "gzip"])
+def test_writeeigen(benchmark, tmp_path, compression):
+    """
+    time x energy x altitude x wavelength VER cube, about 21 MB
+    """
+    Nt, NE, Nz, Nw = 4, 33, 200, 100
+    Ebins = np.logspace(1.7, 4.2, NE)
+    z = np.linspace(90, 1000, Nz)
+    t = np.datetime64("2013-03-31T09:00") + np.arange(Nt) * np.timedelta64(1, "m")
+    ver = xarray.DataArray(
+        np.random.default_rng(0).random((Nt, NE, Nz, Nw)),
+        coords=[("time", t), ("energy_ev", Ebins), ("alt_km", z), ("wavelength_nm", np.linspace(300, 900, Nw))],
+    )
+
+    benchmark.pedantic(writeeigen, (tmp_path / "eigen.h5", Ebins, t, z), {"ver": ver, "compression": compression}, rounds=3)
+
+    assert (tmp_path / "eigen.h5").stat().st_size > 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
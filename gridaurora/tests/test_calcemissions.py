@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+import os
+import shutil
+from pathlib import Path
+from types import SimpleNamespace
+import numpy as np
+import xarray
+import pytest
+from pytest import approx
+
+gac = pytest.importorskip("gridaurora.calcemissions")
+
+R = Path(__file__).resolve().parents[1]
+reactfn = R / "precompute/vjeinfc.h5"
+
+reactions = ["no1s", "no1d", "noii2p", "po3p3p", "po3p5p", "p1ng", "pmein", "p2pg", "p1pg"]
+families = ["metastable", "atomic", "n21ng", "n2meinel", "n22pg", "n21pg"]
+
+
+def synthrates(Nalt: int = 50) -> xarray.DataArray:
+    z = np.linspace(90, 500, Nalt)
+    rates = np.exp(-((z[:, None] - 110 - 10 * np.arange(len(reactions))) ** 2) / 2000)
+    return xarray.DataArray(rates, coords=[("alt_km", z), ("reaction", reactions)])
+
+
+def test_reactioncache(tmp_path):
+    fn = tmp_path / "vjeinfc.h5"
+    shutil.copy(reactfn, fn)
+
+    tables = gac.loadreactions(fn)
+    assert gac.loadreactions(fn) is tables
+
+    assert tables["N2_1PG"]["lambda"].ndim == 1
+    assert tables["N2+1NG"]["scalevec"].size == tables["N2+1NG"]["A"].size
+    assert tables["N2+Meinel"]["scalevec"] == approx(
+        gac.bandscale(tables["N2+Meinel"]["A"], tables["N2+Meinel"]["fc"] / tables["N2+Meinel"]["fc"].sum()), nan_ok=True
+    )
+    # %% file changed on disk
+    st = fn.stat()
+    os.utime(fn, ns=(st.st_atime_ns, st.st_mtime_ns + 1000000000))
+    newtables = gac.loadreactions(fn)
+    assert newtables is not tables
+    assert gac.loadreactions(fn) is newtables
+    # %% explicit invalidation
+    gac.clearreactions(fn)
+    assert gac.loadreactions(fn) is not newtables
+
+    gac.clearreactions()
+    assert not gac._reactcache
+
+
+def test_emissionoperator():
+    rates = synthrates()
+    sim = SimpleNamespace(reacreq=families, reactionfn=reactfn)
+
+    dfver, ver, br = gac.calcemissions(rates, sim)
+    assert dfver.dims == ("alt_km", "wavelength_nm")
+    assert (np.diff(dfver.wavelength_nm) >= 0).all()
+    assert gac.emissionoperator(families, reactfn) is gac.emissionoperator(families[::-1], reactfn)
+    # %% compare with band-by-band concatenation
+    v = lamb = b = None
+    for get in (gac.getMetastable, gac.getAtomic, gac.getN21NG, gac.getN2meinel, gac.getN22PG, gac.getN21PG):
+        v, lamb, b = get(rates, v, lamb, b, reactfn)
+    lamb, v, b = gac.sortelimlambda(lamb, v, b)
+
+    assert dfver.wavelength_nm.values == approx(lamb)
+    assert ver == approx(v, rel=1e-12, nan_ok=True)
+    assert br == approx(b, rel=1e-12, nan_ok=True)
+    # %% NaN rate stays within its reaction's wavelengths
+    rates[5, reactions.index("p1ng")] = np.nan
+    ver = gac.calcemissions(rates, sim)[1]
+    v = lamb = b = None
+    for get in (gac.getMetastable, gac.getAtomic, gac.getN21NG, gac.getN2meinel, gac.getN22PG, gac.getN21PG):
+        v, lamb, b = get(rates, v, lamb, b, reactfn)
+    v = gac.sortelimlambda(lamb, v, b)[1]
+
+    assert np.isnan(ver[5]).any() and not np.isnan(ver[5]).all()
+    assert ver == approx(v, rel=1e-12, nan_ok=True)
+
+
+def test_batched():
+    rates = synthrates()
+    t = np.arange("2013-03-31T09", "2013-03-31T12", dtype="datetime64[h]")
+    E = np.array([100.0, 1000.0, 10000.0, 30000.0])
+    scale = xarray.DataArray(np.arange(1, t.size * E.size + 1.0).reshape(t.size, E.size), coords=[("time", t), ("energy_ev", E)])
+    batch = (scale * rates).transpose("time", "energy_ev", "alt_km", "reaction")
+
+    sim = SimpleNamespace(reacreq=families, reactionfn=reactfn)
+
+    ver, _, br = gac.calcemissions(batch, sim)
+    assert ver.dims == ("time", "energy_ev", "alt_km", "wavelength_nm")
+    assert br.shape == (t.size, E.size, ver.wavelength_nm.size)
+    assert (ver.time == t).all()
+
+    ver1, _, br1 = gac.calcemissions(batch.isel(time=2, energy_ev=1), sim)
+    assert ver1.time == t[2]
+    assert ver.isel(time=2, energy_ev=1).values == approx(ver1.values, nan_ok=True)
+    assert br[2, 1] == approx(br1, nan_ok=True)
+    # %% dimension order of input does not matter
+    ver2 = gac.calcemissions(batch.transpose("alt_km", "time", "energy_ev", "reaction"), sim)[0]
+    assert ver2.dims == ("time", "energy_ev", "alt_km", "wavelength_nm")
+    assert ver2.values == approx(ver.values, nan_ok=True)
+
+
+def test_noreactions():
+    with pytest.raises(ValueError):
+        gac.EmissionOperator(["bogus"], reactfn)
+
+
+def test_bandscale():
+    A = np.array([[1.0, 3.0], [2.0, np.nan]])
+    fc = np.array([0.5, 2.0])
+
+    assert gac.bandscale(A, fc) == approx([0.125, 2.0, 0.375, np.nan], nan_ok=True)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+from datetime import datetime, timedelta
+import numpy as np
+import xarray
+import pytest
+from pytest import approx
+
+h5py = pytest.importorskip("h5py")
+gaw = pytest.importorskip("gridaurora.writeeigen")
+
+t = [datetime(2013, 3, 31, 9) + timedelta(minutes=i) for i in range(3)]
+Ebins = np.logspace(2, 4, 5)
+z = np.arange(90.0, 150, 10)
+lamb = np.array([427.8, 557.7, 630.0, 777.4])
+
+
+def synthver() -> xarray.DataArray:
+    dat = np.arange(len(t) * (Ebins.size - 1) * z.size * lamb.size, dtype=float).reshape(len(t), Ebins.size - 1, z.size, lamb.size)
+    return xarray.DataArray(
+        dat,
+        coords={"time": t, "energy": Ebins[:-1], "alt_km": z, "wavelength_nm": lamb},
+        dims=["time", "energy", "alt_km", "wavelength_nm"],
+    )
+
+
+@pytest.mark.parametrize("compression", ["gzip", "lzf", "shuffle+gzip", None])
+def test_eigenwriter(tmp_path, compression):
+    fn = tmp_path / "eigen.h5"
+    ver = synthver()
+
+    with gaw.EigenWriter(fn, Ebins, z, latlon=(65, -148), compression=compression) as f:
+        for i in range(len(t)):
+            f.append(t[i], ver=ver[i])
+
+    with h5py.File(fn, "r") as f:
+        d = f["/ver/eigenprofile"]
+        assert d.shape == ver.shape
+        assert d.chunks == (1, 1, z.size, lamb.size)
+        assert d.maxshape[0] is None
+        assert d.compression == (compression.split("+")[-1] if compression else None)
+        assert d[:] == approx(ver.values)
+        assert f["/ut1_unix"][:] == approx([1364720400.0, 1364720460.0, 1364720520.0])
+        assert f["/ver/wavelength"][:] == approx(lamb)
+
+
+def test_eigenwriter_reject(tmp_path):
+    fn = tmp_path / "eigen.h5"
+    ver = synthver()
+
+    with gaw.EigenWriter(fn, Ebins, z) as f:
+        f.append(t[0], ver=ver[0])
+        with pytest.raises(ValueError):  # wrong shape
+            f.append(t[1], ver=ver[1, :, :-1])
+        with pytest.raises(ValueError):  # times and VER differ
+            f.append(t[1:], ver=ver[1:2])
+        with pytest.raises(ValueError):  # energy deposition missing at the first time
+            f.append(t[1], ver=ver[1], tezs=ver[1, 0, :, :2])
+        f.append(t[1:], ver=ver[1:])
+
+    with h5py.File(fn, "r") as f:
+        assert f["/ut1_unix"][:] == approx([1364720400.0, 1364720460.0, 1364720520.0])
+        assert f["/ver/eigenprofile"][:] == approx(ver.values)
+        assert "/energydeposition" not in f
+
+
+def test_writeeigen(tmp_path):
+    fn = tmp_path / "eigen.h5"
+    ver = synthver()
+
+    gaw.writeeigen(fn, Ebins, t, z, ver=ver, latlon=(65, -148))
+
+    with h5py.File(fn, "r") as f:
+        assert f["/ver/eigenprofile"][:] == approx(ver.values)
+        assert f["/ut1_unix"].size == len(t)
+        assert f["/sensorloc"][:] == approx([65, -148])
+
+    with pytest.raises(ValueError):
+        gaw.EigenWriter(fn, Ebins, z, compression="bz2")
+
+
+def test_readeigen(tmp_path, monkeypatch):
+    gar = pytest.importorskip("gridaurora.readeigen")
+
+    fn = tmp_path / "eigen.h5"
+    ver = synthver()
+    gaw.writeeigen(fn, Ebins, t, z, ver=ver, latlon=(65, -148))
+
+    reads = []
+    getitem = gar._H5Array._getitem
+
+    def _getitem(self, key):
+        reads.append(key)
+        return getitem(self, key)
+
+    monkeypatch.setattr(gar._H5Array, "_getitem", _getitem)
+
+    eig = gar.readeigen(fn)
+    assert not reads
+    assert eig["ver"].dims == ("time", "energy_ev", "alt_km", "wavelength_nm")
+    assert (eig.time.values == np.array(t, dtype="datetime64[us]")).all()
+    assert eig.energy_ev.values == approx(Ebins[:-1])
+
+    v = eig["ver"].sel(time=t[1], energy_ev=slice(300, 3000)).values
+    assert v == approx(ver[1, 1:3].values)
+    assert reads == [(1, slice(1, 3, 1), slice(None), slice(None))]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -1,10 +1,12 @@
 #!/usr/bin/env python
+import os
+import shutil
 from pathlib import Path
 import pytest
 from pytest import approx
 
 R = Path(__file__).resolve().parents[1]
-dpath = R / "gridaurora/precompute"
+dpath = R / "precompute"
 
 
 def test_opticalfilter():
@@ -30,5 +32,353 @@ def test_opticalfilter():
         assert ((0 <= T[f]) & (T[f] <= 1)).all()
 
 
+def test_systemTcache(tmp_path):
+    gaf = pytest.importorskip("gridaurora.filterload")
+
+    bg3fn = tmp_path / "BG3transmittance.h5"
+    shutil.copy(dpath / "BG3transmittance.h5", bg3fn)
+    windfn = dpath / "ixonWindowT.h5"
+    qefn = dpath / "emccdQE.h5"
+    testlambda = [427.8, 555.7, 630.0]
+
+    gaf.clearsystemTcache()
+
+    T = gaf.getSystemT(testlambda, bg3fn, windfn, qefn, 0, 0)
+    T["sys"][:] = 0  # must not alter cached copy
+    T2 = gaf.getSystemT(testlambda, bg3fn, windfn, qefn, 0, 0)
+    assert (T2["sys"] > 0).all()
+    assert gaf.systemTcacheinfo() == {"hits": 1, "misses": 1, "size": 1, "maxsize": gaf.SYSTEMT_CACHESIZE}
+    # %% any change of wavelength grid, geometry or input file is a miss
+    gaf.getSystemT(testlambda[:2], bg3fn, windfn, qefn, 0, 0)
+    gaf.getSystemT(testlambda, bg3fn, windfn, qefn, 0, 10)
+    st = bg3fn.stat()
+    os.utime(bg3fn, ns=(st.st_atime_ns, st.st_mtime_ns + 1000000000))
+    gaf.getSystemT(testlambda, bg3fn, windfn, qefn, 0, 0)
+    assert gaf.systemTcacheinfo()["misses"] == 4
+
+    gaf.clearsystemTcache()
+    assert gaf.systemTcacheinfo()["size"] == 0
+    # %% cache=False uses neither cache
+    gaf.clearcurvecache()
+    gaf.getSystemT(testlambda, bg3fn, windfn, qefn, 0, 0, cache=False)
+    assert gaf.systemTcacheinfo()["size"] == 0
+    assert len(gaf._curvecache) == 0
+
+
+def test_systemTgeom():
+    gaf = pytest.importorskip("gridaurora.filterload")
+
+    bg3fn = dpath / "BG3transmittance.h5"
+    windfn = dpath / "ixonWindowT.h5"
+    qefn = dpath / "emccdQE.h5"
+    testlambda = [427.8, 555.7, 630.0]
+
+    T = gaf.getSystemTgeom(testlambda, bg3fn, windfn, qefn, [[0], [0.2]], [0, 30, 45])
+    assert T["sys"].dims == ("geometry", "wavelength_nm")
+    assert T["filter"].dims == ("wavelength_nm",)
+    assert T.geometry.size == 6
+    assert (T.zenang_deg == [0, 30, 45, 0, 30, 45]).all()
+
+    T1 = gaf.getSystemT(testlambda, bg3fn, windfn, qefn, 0.2, 30)
+    assert T["sys"][4].values == approx(T1["sys"].values)
+
+
+def test_systemTfilters(tmp_path):
+    np = pytest.importorskip("numpy")
+    xarray = pytest.importorskip("xarray")
+    gaf = pytest.importorskip("gridaurora.filterload")
+
+    windfn = dpath / "ixonWindowT.h5"
+    qefn = dpath / "emccdQE.h5"
+    flist = [dpath / f"{f}transmittance.h5" for f in ("BG3", "Wratten21", "HoyaV10")]
+    testlambda = [427.8, 555.7, 630.0]
+    br = np.array([[1.0, 2.0, 3.0], [0.0, 1.0, 0.0]])
+
+    T = gaf.getSystemTfilters(testlambda, flist, windfn, qefn, 0, 0, spectrum=br)
+    assert T["sys"].dims == ("filter", "wavelength_nm")
+    assert list(T.filter.values) == ["Schott BG3", "Wratten 21", "Hoya V-10"]
+    assert T["brightness"].shape == (2, 3)
+
+    for i, f in enumerate(flist):
+        T1 = gaf.getSystemT(testlambda, f, windfn, qefn, 0, 0)
+        assert T["sys"][i].values == approx(T1["sys"].values)
+        assert T["brightness"][:, i].values == approx(br @ T1["sys"].values)
+    # %% filter narrower than the wavelength grid: no transmission outside its datasheet range
+    wl = [427.8, 630.0, 844.6]
+    T = gaf.getSystemTfilters(wl, flist, windfn, qefn, 0, 0, spectrum=br)
+    assert T["sys"].isnull().any()
+    assert np.isfinite(T["brightness"]).all()
+    assert T["brightness"].values == approx((T["sys"] * xarray.DataArray(br, dims=("i", "wavelength_nm"))).sum("wavelength_nm").T)
+    # %% same filter name in two files: named by file
+    (tmp_path / "other").mkdir()
+    for f in ("a.h5", "b.h5", "other/a.h5"):
+        shutil.copy(flist[0], tmp_path / f)
+    T = gaf.getSystemTfilters(testlambda, [flist[0], tmp_path / "a.h5", tmp_path / "b.h5"], windfn, qefn, 0, 0)
+    assert list(T.filter.values) == ["Schott BG3", "a", "b"]
+    with pytest.raises(ValueError):
+        gaf.getSystemTfilters(testlambda, [flist[0], tmp_path / "a.h5", tmp_path / "other/a.h5"], windfn, qefn, 0, 0)
+
+
+def test_transmittancestack(monkeypatch):
+    np = pytest.importorskip("numpy")
+    gaf = pytest.importorskip("gridaurora.filterload")
+
+    testlambda = np.array([427.8, 555.7, 630.0])
+    T = gaf.getSystemT(testlambda, dpath / "BG3transmittance.h5", dpath / "ixonWindowT.h5", dpath / "emccdQE.h5", 0, 0)
+
+    S = gaf.TransmittanceStack(testlambda)
+    assert S.addfilter(dpath / "HoyaV10transmittance.h5") == ("Hoya V-10", "Hoya V-10")
+    S.addfilter(dpath / "Wratten21transmittance.h5")
+    S.addfilter(dpath / "BG3transmittance.h5", "bg3")
+    S.addwindow(dpath / "ixonWindowT.h5")
+    S.addqe(dpath / "emccdQE.h5")
+    S.addatm(0, 0)
+
+    assert S("bg3", "window", "qe", "atm") == approx(T["sys"].values)
+    assert S("Hoya V-10", "Wratten 21") == approx(S("Hoya V-10") * S("Wratten 21"))
+    assert S.log("window", "qe") is S.log("qe", "window")
+    # %% no underflow in log space
+    S.add("ND", 1e-200)
+    assert S.log("ND", "ND", "bg3") == approx(2 * np.log(1e-200) + S.log("bg3"))
+    # %% replacing a curve drops its cached products
+    S.add("ND", 0.1)
+    assert S("ND", "qe") == approx(0.1 * S("qe"))
+    # %% bounded curve cache, least recently used dropped first
+    monkeypatch.setattr(gaf, "CURVE_CACHESIZE", 2)
+    gaf.clearcurvecache()
+    for f in ("HoyaV10", "Wratten21", "BG3"):
+        S.addfilter(dpath / f"{f}transmittance.h5")
+    assert len(gaf._curvecache) == 2
+    assert [Path(k[3]).stem for k in gaf._curvecache] == ["Wratten21transmittance", "BG3transmittance"]
+
+
+def test_responselib(tmp_path):
+    np = pytest.importorskip("numpy")
+    gaf = pytest.importorskip("gridaurora.filterload")
+    grl = pytest.importorskip("gridaurora.responselib")
+
+    fn = grl.buildresponselib(tmp_path / "responses.npy", dpath.glob("*.h5"))
+    lib = grl.responselibrary(fn)
+    assert grl.responselibrary(fn) is lib
+    assert isinstance(lib.logT, np.memmap)
+    assert {"BG3", "NE01", "ixonWindowT", "emccdQE"} <= set(lib.names)
+    assert "Schott BG3" in lib
+
+    wl = np.linspace(250, 1150, 1001)
+    assert lib("Schott BG3", wl) == approx(gaf._filterT(wl, dpath / "BG3transmittance.h5")[0], rel=1e-12)
+    assert lib("emccdQE", wl) == approx(gaf._qeT(wl, dpath / "emccdQE.h5"), abs=1e-4)
+    assert np.isnan(lib("Wratten21", [650, 750])).tolist() == [False, True]
+
+    S = gaf.TransmittanceStack(wl)
+    S.addlibrary(lib, "BG3")
+    S.addfilter(dpath / "BG3transmittance.h5", "BG3file")
+    assert S("BG3") == approx(S("BG3file"), rel=1e-12)
+    # %% in place of the curve files in getSystemT
+    fns = (dpath / "BG3transmittance.h5", dpath / "ixonWindowT.h5", dpath / "emccdQE.h5")
+    wl = np.array([427.8, 555.7, 630.0, 777.4])
+    T = gaf.getSystemT(wl, *fns, 0, 0)
+    Tlib = gaf.getSystemT(wl, *fns, 0, 0, lib=fn)
+    assert Tlib["sys"].values == approx(T["sys"].values, rel=1e-3)
+    assert Tlib.filename == "Schott BG3"
+    with pytest.raises(ValueError):  # outside the window curve, as for the file
+        gaf.getSystemT([150.0, 500.0], *fns, 0, 0, lib=lib)
+    # %% two library files are both kept loaded
+    fn2 = grl.buildresponselib(tmp_path / "filters.npy", dpath.glob("*transmittance.h5"))
+    lib2 = grl.responselibrary(fn2)
+    assert grl.responselibrary(fn) is lib
+    assert grl.responselibrary(fn2) is lib2
+    # %% files not in the library are read as usual
+    assert gaf.getSystemT(wl, *fns, 0, 0, lib=lib2)["sys"].values == approx(Tlib["sys"].values, rel=1e-3)
+    # %% candidate filters
+    flist = [dpath / f"{f}transmittance.h5" for f in ("BG3", "HoyaV10")]
+    Tf = gaf.getSystemTfilters(wl, flist, *fns[1:], 0, 0)
+    Tflib = gaf.getSystemTfilters(wl, flist, *fns[1:], 0, 0, lib=fn)
+    assert list(Tflib.filter.values) == ["Schott BG3", "Hoya V-10"]
+    assert Tflib["sys"].values == approx(Tf["sys"].values, rel=1e-3, nan_ok=True)
+    # %% scalar wavelength
+    assert lib("BG3", 557.7) == approx(lib("BG3", [557.7])[0])
+    assert np.ndim(lib("BG3", 557.7)) == 0
+    # %% only the library's own source files are served from it, unchanged
+    src = tmp_path / "src"
+    src.mkdir()
+    shutil.copy2(dpath / "BG3transmittance.h5", src)
+    lib3 = grl.responselibrary(grl.buildresponselib(tmp_path / "src.npy", [src / "BG3transmittance.h5"]))
+    assert lib3.fromfile(src / "BG3transmittance.h5") == "BG3"
+    assert lib3.fromfile(dpath / "BG3transmittance.h5") is None  # same name, another path
+
+    other = tmp_path / "other"
+    other.mkdir()
+    shutil.copy(dpath / "HoyaV10transmittance.h5", other / "BG3transmittance.h5")
+    assert lib3.fromfile(other / "BG3transmittance.h5") is None
+
+    st = (src / "BG3transmittance.h5").stat()
+    os.utime(src / "BG3transmittance.h5", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert lib3.fromfile(src / "BG3transmittance.h5") == "BG3"  # touched, same content
+
+    shutil.copy(dpath / "HoyaV10transmittance.h5", src / "BG3transmittance.h5")
+    os.utime(src / "BG3transmittance.h5", ns=(st.st_atime_ns, st.st_mtime_ns + 2 * 10**9))
+    assert lib3.fromfile(src / "BG3transmittance.h5") is None  # edited
+    Tsrc = gaf.getSystemT(wl, src / "BG3transmittance.h5", *fns[1:], 0, 0, lib=lib3, cache=False)
+    Thoya = gaf.getSystemT(wl, dpath / "HoyaV10transmittance.h5", *fns[1:], 0, 0, cache=False)
+    assert Tsrc["sys"].values == approx(Thoya["sys"].values, rel=1e-12, nan_ok=True)
+
+
+def test_interpolate():
+    np = pytest.importorskip("numpy")
+    interp1d = pytest.importorskip("scipy.interpolate").interp1d
+    gi = pytest.importorskip("gridaurora.interpolate")
+
+    rng = np.random.default_rng(0)
+    x = rng.uniform(300, 900, 80)  # unsorted, as ixonWindowT
+    y = rng.normal(size=(3, x.size))
+    y[:, ::7] = -np.inf  # log of zero transmission
+    xnew = np.concatenate((rng.uniform(250, 950, 1000), x[::5], [x.min(), x.max(), np.nan]))
+
+    f = gi.Interpolator(x, xnew, bounds="nan")
+    with np.errstate(invalid="ignore"):  # per curve: interp1d takes the numpy.interp path for 1-D y only
+        ref = np.array([interp1d(x, c, bounds_error=False)(xnew) for c in y])
+    assert np.array_equal(f(y), ref, equal_nan=True)
+    assert np.array_equal(f(y[1]), ref[1], equal_nan=True)
+    assert np.array_equal(gi.interplinear(x, y[1], xnew, bounds="nan"), ref[1], equal_nan=True)
+
+    i = np.argsort(x)
+    assert np.array_equal(gi.Interpolator(x, xnew, bounds="edge")(y[0]), np.interp(xnew, x[i], y[0, i]), equal_nan=True)
+
+    inside = np.linspace(x.min(), x.max(), 500)
+    assert np.array_equal(gi.interplinear(x, y[2], inside), interp1d(x, y[2])(inside), equal_nan=True)
+    with pytest.raises(ValueError):
+        gi.interplinear(x, y[2], xnew)
+
+
+def test_opticalmodel(tmp_path):
+    np = pytest.importorskip("numpy")
+    xarray = pytest.importorskip("xarray")
+    gaf = pytest.importorskip("gridaurora.filterload")
+    grl = pytest.importorskip("gridaurora.responselib")
+    gom = pytest.importorskip("gridaurora.opticalmod")
+    from types import SimpleNamespace
+
+    sim = SimpleNamespace(
+        bg3fn=dpath / "BG3transmittance.h5", windowfn=dpath / "ixonWindowT.h5", qefn=dpath / "emccdQE.h5", opticalfilter="bg3"
+    )
+    z = np.linspace(90, 300, 20)
+    wl = np.array([427.8, 555.7, 630.0, 777.4])
+    ver = xarray.DataArray(np.random.default_rng(0).random((z.size, wl.size)), coords=[("alt_km", z), ("wavelength_nm", wl)])
+
+    T = gaf.getSystemT(wl, sim.bg3fn, sim.windowfn, sim.qefn, 0, 0)["sys"].values
+    ref = (ver * T[None, :]).sum("wavelength_nm")
+
+    VERgray = gom.opticalModel(sim, ver, 0, 0)
+    assert VERgray.dims == ("alt_km",)
+    assert VERgray.values == approx(ref.values)
+    # %% written straight into a column of preallocated output
+    Peigen = np.zeros((z.size, 3), order="F")
+    assert gom.opticalModel(sim, ver.T, 0, 0, out=Peigen[:, 1]) is not None
+    assert Peigen[:, 1] == approx(ref.values)
+    assert (Peigen[:, [0, 2]] == 0).all()
+    # %% filter narrower than the VER wavelengths: no transmission outside its datasheet range
+    sim.bg3fn = dpath / "Wratten21transmittance.h5"
+    T = gaf.getSystemT(wl, sim.bg3fn, sim.windowfn, sim.qefn, 0, 0)["sys"]
+    assert T.isnull().any()
+    VERgray = gom.opticalModel(sim, ver, 0, 0)
+    assert np.isfinite(VERgray).all()
+    assert VERgray.values == approx((ver * T).sum("wavelength_nm").values)
+    # %% curves from a response library
+    sim.responselib = grl.buildresponselib(tmp_path / "responses.npy", dpath.glob("*.h5"))
+    assert gom.opticalModel(sim, ver, 0, 0).values == approx(VERgray.values, rel=1e-3)
+    # %% NaN VER counts as no emission
+    del sim.responselib
+    ver[3, 1] = np.nan
+    assert np.isfinite(gom.opticalModel(sim, ver, 0, 0)).all()
+    assert gom.opticalModel(sim, ver, 0, 0).values == approx((ver * T).sum("wavelength_nm").values)
+
+
+def test_lowtrantable(tmp_path, monkeypatch):
+    np = pytest.importorskip("numpy")
+    glt = pytest.importorskip("gridaurora.lowtrantable")
+    gaf = pytest.importorskip("gridaurora.filterload")
+
+    calls = []
+
+    def atmosphere(c1: dict):
+        """ synthetic stand-in for LOWTRAN: optical depth 0.1 at zenith """
+        calls.append(c1["angle"])
+        wl = np.linspace(c1["wlshort"], c1["wllong"], 11)
+        return wl, np.exp(-0.1 / np.cos(np.radians(c1["angle"]))) * np.ones(wl.size)
+
+    glt.buildtable(400, 700, 0, [0, 10, 20], tmp_path, atmosphere)
+    assert calls == [0, 10, 20]
+    assert len(list(tmp_path.glob("*.h5"))) == 1
+
+    wl, T = glt.transmittance(400, 700, 0, 10, tmp_path, compute=atmosphere)
+    assert T == approx(np.exp(-0.1 / np.cos(np.radians(10))))
+    # %% interpolation within tolerance
+    wl, T = glt.transmittance(400, 700, 0, 15, tmp_path, zentol_deg=5, compute=atmosphere)
+    assert len(calls) == 3
+    assert wl == approx(np.linspace(400, 700, 11))
+    assert T[0] == approx(np.exp(-0.1 / np.cos(np.radians(15))), rel=1e-3)
+    # %% outside tolerance, or new altitude: run model and store
+    glt.transmittance(400, 700, 0, 15, tmp_path, zentol_deg=1, compute=atmosphere)
+    glt.transmittance(400, 700, 1.5, 15, tmp_path, zentol_deg=5, compute=atmosphere)
+    assert calls[-2:] == [15, 15]
+    zen, wl, T = glt.loadtable(glt.tablefn(400, 700, tmp_path), 0)
+    assert zen == approx([0, 10, 15, 20])
+    # %% tolerance per getSystemT call, without LOWTRAN a miss is no absorption
+    monkeypatch.setattr(glt, "CACHEDIR", tmp_path)
+    monkeypatch.setattr(glt, "lowtran", None)
+    fns = (dpath / "BG3transmittance.h5", dpath / "ixonWindowT.h5", dpath / "emccdQE.h5")
+    wl = [400.0, 555.7, 700.0]  # the table's wavelength range
+    T = gaf.getSystemT(wl, *fns, 0, 17.5, zentol_deg=5)["atm"].values
+    assert T == approx(np.exp(-0.1 / np.cos(np.radians(17.5))), rel=1e-3)
+    assert (gaf.getSystemT(wl, *fns, 0, 17.5, zentol_deg=1)["atm"] == 1).all()
+    S = gaf.TransmittanceStack(wl)
+    assert S(S.addatm(0, 17.5, zentol_deg=5)) == approx(T)
+
+
+def test_lowtrantable_concurrent(tmp_path):
+    np = pytest.importorskip("numpy")
+    h5py = pytest.importorskip("h5py")
+    glt = pytest.importorskip("gridaurora.lowtrantable")
+    from concurrent.futures import ProcessPoolExecutor
+
+    fn = glt.tablefn(400, 700, tmp_path)
+    wl = np.linspace(400, 700, 11)
+    zen = np.arange(0, 80, 10.0)
+    # %% several processes appending to one cold table, as getTranscar beam workers
+    with ProcessPoolExecutor(4) as pool:
+        T = [np.exp(-z / 100) * np.ones(wl.size) for z in zen]
+        list(pool.map(glt.appendtable, [fn] * zen.size, [0] * zen.size, zen, [wl] * zen.size, T))
+
+    z, _, T = glt.loadtable(fn, 0)
+    assert z == approx(zen)
+    assert T[:, 0] == approx(np.exp(-zen / 100))
+    assert sorted(f.name for f in tmp_path.iterdir()) == [fn.name, fn.name + ".lock"]
+    # %% table held open for writing elsewhere: a miss, not an error
+    with h5py.File(fn, "a"):
+        try:
+            z = glt.loadtable(fn, 0)[0]
+        except OSError as e:
+            pytest.fail(f"loadtable raised {e}")
+
+
+def test_lowtrantable_lock(tmp_path, monkeypatch):
+    np = pytest.importorskip("numpy")
+    glt = pytest.importorskip("gridaurora.lowtrantable")
+
+    fn = glt.tablefn(400, 700, tmp_path)
+    wl = np.linspace(400, 700, 11)
+    monkeypatch.setattr(glt, "LOCK_TIMEOUT_S", 0.2)
+    # %% lock file left by a killed writer is not held
+    fn.with_name(fn.name + ".lock").touch()
+    glt.appendtable(fn, 0, 0, wl, np.ones(wl.size))
+    # %% lock held by another writer
+    with glt._locked(fn):
+        with pytest.raises(TimeoutError):
+            glt.appendtable(fn, 0, 10, wl, np.ones(wl.size))
+
+    glt.appendtable(fn, 0, 10, wl, np.ones(wl.size))
+    assert glt.loadtable(fn, 0)[0] == approx([0, 10])
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+import numpy as np
+import pytest
+from pytest import approx
+from gridaurora.eFluxGen import fluxgen, maxwellian
+
+E = np.logspace(2, 4.35, num=200, base=10)
+E0 = np.array([1e4, 5250, 3500, 2250, 1000, 750, 500])
+Wbc = np.array([0.25, 0.375, 0.4, 0.5, 0.75, 0.9, 1.1])
+bm = np.array([3, 2.5, 2.5, 2.5, 3.0, 3.0, 3.0])
+Bm0 = np.array([6500, 5500, 4750, 4000, 3000, 2500, 2000])
+Bhf = np.array([0.5, 0.3, 0.215, 0.15, 0.125, 0.125, 0.125])
+
+
+def test_fluxgen():
+    Phi, low, mid, hi, base, Q = fluxgen(E, E0, 1e12, Wbc, 0.8, bm, 4.0, Bm0, Bhf)
+    assert Phi.shape == (E.size, E0.size)
+    assert Phi.flags.f_contiguous
+    assert Phi == approx(base + low + mid + hi)
+    assert (low[E[:, None] > E0] == 0).all()
+    assert (hi[E[:, None] < E0] == 0).all()
+    # peak of each spectrum near its E0
+    assert E[Phi.argmax(axis=0)] == approx(E0, rel=0.1)
+
+    Phi2, Q2 = fluxgen(E, E0, 1e12, Wbc, 0.8, bm, 4.0, Bm0, Bhf, components=False)
+    assert Phi2.flags.f_contiguous
+    assert (Phi2 == Phi).all()
+    assert Q2 == approx(Q, rel=1e-12)
+
+
+def test_maxwellian():
+    Phi, Q = maxwellian(E, E0[:2], 1e12)
+    assert Phi.shape == (E.size, 2)
+    assert Q == approx(np.trapz(Phi, E, axis=0))
+
+
+def test_fluxlibrary(tmp_path):
+    pytest.importorskip("h5py")
+    gal = pytest.importorskip("gridaurora.fluxlibrary")
+
+    fn = tmp_path / "lib.h5"
+    params = {"E0": E0, "Q0": 1e12, "Wbc": [0.25, 0.5, 1.0], "bl": 0.8, "bm": 3.0, "bh": 4.0, "Bm": [2000, 6500], "Bhf": Bhf[:3]}
+    gal.buildfluxlib(fn, E, "strickland", params, chunksize=10)
+
+    lib = gal.FluxLibrary(fn)
+    assert len(lib) == E0.size * 3 * 2 * 3
+    assert lib.model == "strickland"
+
+    i, Phi = lib.nearest(E0=[2400, 900], Wbc=0.45, Bm=6000, Bhf=0.3)
+    p = lib.params(i)
+    assert p["E0"] == approx([2250, 1000])
+    assert p["Wbc"] == approx(0.5)
+    assert p["Bm"] == approx(6500)
+    assert p["Bhf"] == approx(0.3)
+
+    ref = fluxgen(E, p["E0"], 1e12, p["Wbc"], 0.8, 3.0, 4.0, p["Bm"], p["Bhf"], components=False)[0]
+    assert Phi == approx(ref.T)
+
+    with pytest.raises(ValueError):
+        gal.buildfluxlib(fn, E, "maxwellian", params)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
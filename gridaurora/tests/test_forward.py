@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+import numpy as np
+import xarray
+import pytest
+from pytest import approx
+from gridaurora import chapman_profile
+from gridaurora.forward import ForwardModel, forwardmodel
+from gridaurora.eFluxGen import maxwellian
+
+EKpcolor = np.logspace(2, 4.5, 34)
+Ek = EKpcolor[:-1]
+z = np.arange(90.0, 300, 2.5)
+Peigen = xarray.DataArray(
+    np.column_stack([chapman_profile(200 - 25 * np.log10(e), z, 10) for e in Ek]), coords=[("alt_km", z), ("energy_ev", Ek)]
+)
+
+
+def test_forward():
+    phi = maxwellian(Ek, [1000, 3000, 5000], 1e12)[0]
+
+    ver, br = forwardmodel(Peigen, phi, EKpcolor)
+    assert ver.shape == (z.size, 3)
+    assert br.shape == (3,)
+    # reference: loop over spectra and energies
+    for i in range(3):
+        v = sum(Peigen.values[:, j] * phi[j, i] * (EKpcolor[j + 1] - EKpcolor[j]) for j in range(Ek.size))
+        assert ver[:, i] == approx(v)
+        assert br[i] == approx(np.trapz(v, z))
+
+    fm = ForwardModel(Peigen, EKpcolor, dtype=np.float32)
+    ver32, br32 = fm(phi)
+    assert ver32.dtype == np.float32
+    assert br32 == approx(br, rel=1e-5)
+    assert fm.brightness(phi[:, 0]) == approx(br[0], rel=1e-5)
+
+
+def test_badbins():
+    with pytest.raises(ValueError):
+        ForwardModel(Peigen, Ek)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -1,7 +1,9 @@
 #!/usr/bin/env python
 import pytest
 from pytest import approx
+import numpy as np
 from gridaurora.ztanh import setupz
+from gridaurora.altgrid import altgrid, ztanhgrid, glowgrid
 from gridaurora.worldgrid import latlonworldgrid
 
 
@@ -18,5 +20,79 @@ def test_worldgrid():
     assert glon[0, 0] == approx(glon[:, 0])
 
 
+def test_altgrid():
+    grid = ztanhgrid(300, 90, 1.5, 10.575)
+    assert ztanhgrid(300, 90, 1.5, 10.575) is grid
+    assert altgrid(setupz(300, 90, 1.5, 10.575)) is grid
+    assert grid.w == approx(np.diff(grid.edges))
+
+    g = glowgrid()
+    ver = np.random.default_rng(0).random((2, g.z.size, 4))
+    assert g.integrate(ver, axis=1) == approx(np.trapz(ver, g.z, axis=1))
+
+    with pytest.raises(ValueError):
+        g.z[0] = 0
+    with pytest.raises(ValueError):
+        altgrid([100])
+    # %% any order, as trapz
+    z = np.array([300, 200, 200, 150, 90.0])
+    ver = np.random.default_rng(0).random((z.size, 3))
+    assert altgrid(z).integrate(ver) == approx(np.trapz(ver, z, axis=0))
+    assert altgrid(z).integrate(ver) == approx(-altgrid(z[::-1]).integrate(ver[::-1]))
+
+
+def test_altgridcache(monkeypatch):
+    from gridaurora import altgrid as gag
+
+    monkeypatch.setattr(gag, "ALTGRID_CACHESIZE", 2)
+    gag.clearaltgrid()
+    g = altgrid([90, 100])
+    altgrid([90, 110])
+    assert altgrid([90, 100]) is g  # most recently used
+    altgrid([90, 120])
+    assert len(gag._gridcache) == 2
+    assert altgrid([90, 100]) is g
+    gag.clearaltgrid()
+
+
+def test_regrid():
+    pytest.importorskip("scipy")
+    from gridaurora.regrid import regrid, regridmatrix, edgesfromcenters
+
+    src = edgesfromcenters(np.logspace(2, 4.35, 200))
+    dst = src[10:191:6]  # coarser grid on a subset of the source edges
+    phi = np.random.default_rng(0).random((200, 3, 5))
+
+    R = regridmatrix(src, dst)
+    assert regridmatrix(src, dst) is R
+    # flux preserved over the overlap of the grids
+    phiD = regrid(phi, src, dst)
+    assert phiD.shape == (30, 3, 5)
+    assert (np.diff(dst)[:, None, None] * phiD).sum(axis=0) == approx((np.diff(src)[10:190, None, None] * phi[10:190]).sum(axis=0))
+    # identical grids
+    assert regrid(phi, src, src, axis=0) == approx(phi)
+    # bins with gap, counts per bin
+    assert regrid([1.0, 2.0], [[1, 2], [3, 4]], [0, 5], density=False) == approx([3.0])
+    assert regrid(phi[:, 0, :].T, src, dst, axis=1) == approx(phiD[:, 0, :].T)
+
+    with pytest.raises(ValueError):
+        regridmatrix(src[::-1], dst)
+
+
+def test_regridcache(monkeypatch):
+    pytest.importorskip("scipy")
+    from gridaurora import regrid
+
+    monkeypatch.setattr(regrid, "REGRID_CACHESIZE", 2)
+    regrid.clearregrid()
+    R = regrid.regridmatrix([1, 2, 3], [1, 3])
+    regrid.regridmatrix([1, 2, 3], [1, 2])
+    assert regrid.regridmatrix([1, 2, 3], [1, 3]) is R  # most recently used
+    regrid.regridmatrix([1, 2, 3], [2, 3])
+    assert len(regrid._regridcache) == 2
+    assert regrid.regridmatrix([1, 2, 3], [1, 3]) is R
+    regrid.clearregrid()
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+from pathlib import Path
+from types import SimpleNamespace
+import numpy as np
+import xarray
+import pytest
+from pytest import approx
+from gridaurora.pipeline import emissionstream, timeblocks
+from gridaurora.calcemissions import calcemissions
+
+R = Path(__file__).resolve().parents[1]
+reactfn = R / "precompute/vjeinfc.h5"
+
+reactions = ["no1s", "no1d", "noii2p", "po3p3p", "po3p5p", "p1ng", "pmein", "p2pg", "p1pg"]
+sim = SimpleNamespace(reacreq=["metastable", "atomic", "n21ng", "n2meinel", "n22pg", "n21pg"], reactionfn=reactfn)
+
+
+@pytest.fixture
+def emissionsfile(tmp_path) -> Path:
+    """
+    synthetic excitation rates, per time a header line "time <ISO time>" then one row per altitude:
+    alt_km and one column per reaction
+    """
+    fn = tmp_path / "emissions.dat"
+    z = np.linspace(90, 500, 40)
+    t = np.datetime64("2013-03-31T09:00:00") + np.arange(7) * np.timedelta64(30, "s")
+
+    with fn.open("w") as f:
+        for i, ti in enumerate(t):
+            f.write(f"time {ti}\n")
+            rates = (1 + i) * np.exp(-((z[:, None] - 110 - 10 * np.arange(len(reactions))) ** 2) / 2000)
+            np.savetxt(f, np.column_stack((z, rates)))
+
+    return fn
+
+
+def readblocks(fn: Path, blocksize: int, log: list):
+    """
+    reads blocksize times at a time from the synthetic file
+    """
+    with fn.open("r") as f:
+        lines = f.read().splitlines()  # small test file
+
+    heads = [i for i, line in enumerate(lines) if line.startswith("time")] + [len(lines)]
+    for j in range(0, len(heads) - 1, blocksize):
+        k = heads[j : j + blocksize + 1]  # noqa: E203
+        t = np.array([lines[i].split()[1] for i in k[:-1]], dtype="datetime64[ns]")
+        dat = np.array([np.loadtxt(lines[a + 1 : b]) for a, b in zip(k[:-1], k[1:])])  # noqa: E203
+        log.append(t.size)
+        yield xarray.DataArray(
+            dat[..., 1:], coords=[("time", t), ("alt_km", dat[0, :, 0]), ("reaction", reactions)], name="excitation"
+        )
+
+
+def test_emissionstream(emissionsfile):
+    log = []
+    stream = emissionstream(lambda: readblocks(emissionsfile, 3, log), sim)
+
+    t, ver, br = next(stream)
+    assert log == [3]  # only the first block read so far
+    assert ver.dims == ("alt_km", "wavelength_nm")
+
+    out = [(t, ver, br)] + list(stream)
+    assert log == [3, 3, 1]
+    assert len(out) == 7
+    # %% same as whole file at once
+    rates = xarray.concat(list(readblocks(emissionsfile, 7, [])), dim="time")
+    tver, _, tbr = calcemissions(rates, sim)
+
+    assert np.array([o[0] for o in out]) == approx(tver.time.values.astype(float))
+    assert np.array([o[2] for o in out]) == approx(tbr)
+    assert out[4][1].values == approx(tver[4].values)
+
+
+def test_timeblocks(emissionsfile):
+    rates = next(readblocks(emissionsfile, 7, []))
+
+    assert [b.time.size for b in timeblocks(rates, 2)] == [2, 2, 2, 1]
+    assert len(list(emissionstream([rates], sim, blocksize=2))) == 7
+
+    with pytest.raises(ValueError):
+        next(timeblocks(rates, 0))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
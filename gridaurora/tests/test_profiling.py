@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+import json
+from pathlib import Path
+from types import SimpleNamespace
+import numpy as np
+import xarray
+import pytest
+from gridaurora import profiling
+from gridaurora.calcemissions import calcemissions, clearreactions
+
+R = Path(__file__).resolve().parents[1]
+sim = SimpleNamespace(reacreq=["metastable", "atomic"], reactionfn=R / "precompute/vjeinfc.h5")
+rates = xarray.DataArray(
+    np.ones((20, 5)), coords=[("alt_km", np.linspace(90, 300, 20)), ("reaction", ["no1s", "no1d", "noii2p", "po3p3p", "po3p5p"])]
+)
+
+
+def test_profiling():
+    profiling.reset()
+    calcemissions(rates, sim)
+    assert not profiling.stats()  # off by default
+
+    profiling.enable(memory=True)
+    try:
+        clearreactions()
+        calcemissions(rates, sim)
+        calcemissions(rates, sim)
+        with profiling.stage("custom"):
+            x = np.ones(100000)
+    finally:
+        profiling.disable()
+
+    s = json.loads(profiling.tojson())
+    assert s["calcemissions.calcemissions"]["calls"] == 2
+    assert s["calcemissions.loadreactions"]["calls"] == 1
+    assert s["calcemissions.calcemissions"]["sec"] >= s["calcemissions.loadreactions"]["sec"] > 0
+    assert s["custom"]["bytes"] >= x.nbytes
+
+    profiling.reset()
+    assert not profiling.stats()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -21,5 +21,24 @@ def test_solarangle():
     assert sza == approx(46.451623)
 
 
+def test_solarzenithgrid():
+
+    gas = pytest.importorskip("gridaurora.solarangle")
+    from gridaurora.worldgrid import latlonworldgrid
+
+    glat, glon = latlonworldgrid(latstep=5, lonstep=5)
+    t = ["2015-07-01T00:00:00", "2015-07-01T06:00:00"]
+
+    sza = gas.solarzenithgrid(t, glat, glon)
+    assert sza.shape == (2,) + glat.shape
+    assert gas.solarzenithgrid(t, glat, glon) is sza
+
+    assert gas.solarzenithgrid(datetime(2015, 7, 1), 65, -148, 200) == approx(46.451623, abs=1e-4)
+    i = (0, 31, 6)  # 65N, -150E
+    assert sza[i] == approx(gas.solarzenithangle(datetime(2015, 7, 1), glat[i[1:]], glon[i[1:]], 0)[0], abs=1e-4)
+
+    assert gas.solarzenithgrid(t, glat, glon, precise=False) == approx(sza, abs=0.02)
+
+
 if __name__ == "__main__":
     pytest.main(["-x", __file__])
@@ -1,8 +1,9 @@
 #!/usr/bin/env python
 import pytest
-from datetime import datetime
+from datetime import datetime, date, timedelta, timezone
 from pytest import approx
-from gridaurora import to_ut1unix
+import numpy as np
+from gridaurora import to_ut1unix, totime, toyearmon
 
 
 def test_dt2ut1():
@@ -16,5 +17,36 @@ def test_dt2ut1():
     assert to_ut1unix([1435708800.0]) == approx(1435708800.0)
 
 
+def test_timezone():
+    tz = timezone(timedelta(hours=2))
+
+    assert to_ut1unix(datetime(2015, 7, 1, 2, tzinfo=tz)) == approx(1435708800.0)
+    assert to_ut1unix([datetime(2015, 7, 1, 2, tzinfo=tz), datetime(2015, 7, 1, tzinfo=timezone.utc)]) == approx([1435708800.0] * 2)
+    assert to_ut1unix("2015-07-01T02:00:00+02:00") == approx(1435708800.0)
+    assert to_ut1unix(["2015-07-01T00:00:00Z", "2015-06-30T20:00:00-04:00"]) == approx([1435708800.0] * 2)
+
+
+def test_vectorized():
+    t = np.datetime64("2015-07-01") + np.arange(1000) * np.timedelta64(1, "h")
+    ut1 = 1435708800.0 + 3600.0 * np.arange(1000)
+
+    assert to_ut1unix(t) == approx(ut1)
+    assert to_ut1unix(t.astype(str)) == approx(ut1)
+    assert to_ut1unix(list(t.astype(datetime))) == approx(ut1)
+    assert to_ut1unix(["July 1, 2015", "2015-07-01T01:00:00"]) == approx(ut1[:2])
+
+    assert to_ut1unix(["20150701", "20150701T010000"]) == approx(ut1[:2])
+    assert to_ut1unix("20150701") == approx(ut1[0])
+    with pytest.raises(ValueError):  # seconds as str, not a date
+        to_ut1unix("1435708800")
+
+    assert totime("2015-07-01T00:00:00") == datetime(2015, 7, 1)
+    assert totime("20150701") == datetime(2015, 7, 1)
+
+    assert toyearmon(date(2015, 7, 1)) == 201507
+    assert toyearmon("2015-12-31T23:59:59") == 201512
+    assert (toyearmon(t[[0, -1]]) == [201507, 201508]).all()
+
+
 if __name__ == "__main__":
     pytest.main(["-x", __file__])
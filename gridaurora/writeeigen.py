@@ -1,15 +1,31 @@
 import h5py
+import numpy as np
 from pathlib import Path
 from xarray import DataArray
 from . import to_ut1unix
+from . import profiling
 
 """
 FIXME: refactor to xarray and .to_netcdf()
 """
 
+COMPRESSION = ("gzip", "lzf", "shuffle+gzip", None)
 
+
+@profiling.timed("writeeigen.writeeigen")
 def writeeigen(
-    fn: Path, Ebins, t, z, diffnumflux=None, ver=None, prates=None, lrates=None, tezs=None, latlon=None,
+    fn: Path,
+    Ebins,
+    t,
+    z,
+    diffnumflux=None,
+    ver=None,
+    prates=None,
+    lrates=None,
+    tezs=None,
+    latlon=None,
+    compression: str = "gzip",
+    level: int = 4,
 ):
     if not fn:
         return
@@ -21,13 +37,46 @@ def writeeigen(
 
     print("writing to", fn)
 
-    ut1_unix = to_ut1unix(t)
+    with EigenWriter(fn, Ebins, z, diffnumflux, latlon, compression, level) as f:
+        f.append(np.atleast_1d(t), ver, prates, lrates, tezs)
+
+
+class EigenWriter:
+    """
+    eigenprofile HDF5 file, appended to one or more time steps at a time.
+    Datasets are resizable along time and chunked by single time and energy,
+    so a whole run need not be in memory, and one time or energy slice is cheap to read back.
+
+    compression: "gzip" (with level), "lzf", "shuffle+gzip" or None
+
+    example:
+    with EigenWriter(fn, Ebins, z) as f:
+        for t in times:
+            f.append(t, ver=ver1)  # ver1: NEnergy x Nalt x Nwavelength
+    """
+
+    def __init__(
+        self, fn: Path, Ebins, z, diffnumflux=None, latlon=None, compression: str = "gzip", level: int = 4,
+    ):
+        if compression not in COMPRESSION:
+            raise ValueError(f"compression must be one of {COMPRESSION}")
+
+        if compression == "gzip":
+            self.compression = {"compression": "gzip", "compression_opts": level}
+        elif compression == "shuffle+gzip":
+            self.compression = {"compression": "gzip", "compression_opts": level, "shuffle": True}
+        elif compression == "lzf":
+            self.compression = {"compression": "lzf"}
+        else:
+            self.compression = {}
 
-    with h5py.File(fn, "w") as f:
-        bdt = h5py.special_dtype(vlen=bytes)
-        d = f.create_dataset("/sensorloc", data=latlon)
-        d.attrs["unit"] = "degrees"
-        d.attrs["description"] = "geographic coordinates"
+        self.f = h5py.File(Path(fn).expanduser(), "w")
+        f = self.f
+
+        if latlon is not None:
+            d = f.create_dataset("/sensorloc", data=latlon)
+            d.attrs["unit"] = "degrees"
+            d.attrs["description"] = "geographic coordinates"
         # %% input precipitation flux
         d = f.create_dataset("/Ebins", data=Ebins)
         d.attrs["unit"] = "eV"
@@ -35,40 +84,111 @@ def writeeigen(
         d = f.create_dataset("/altitude", data=z)
         d.attrs["unit"] = "km"
 
-        d = f.create_dataset("/ut1_unix", data=ut1_unix)
+        d = f.create_dataset("/ut1_unix", shape=(0,), maxshape=(None,), dtype=float, chunks=(1024,))
         d.attrs["unit"] = "sec. since Jan 1, 1970 midnight"  # float
 
         if diffnumflux is not None:
             d = f.create_dataset("/diffnumflux", data=diffnumflux)
             d.attrs["unit"] = "cm^-2 s^-1 eV^-1"
             d.attrs["description"] = 'primary electron flux at "top" of modeled ionosphere'
+
+    @profiling.timed("writeeigen.append")
+    def append(self, t, ver=None, prates=None, lrates=None, tezs=None):
+        """
+        t: one time, or a vector of times
+        ver, prates, lrates, tezs: like writeeigen, without the time dimension if t is a single time
+
+        all inputs are checked before anything is written, so a rejected call leaves the file as it was
+        """
+        single = np.ndim(t) == 0
+        ut1_unix = np.atleast_1d(to_ut1unix(t))
+        Nt = ut1_unix.size
+
+        i = self.f["/ut1_unix"].shape[0]
+        inputs = {"/ver/eigenprofile": ver, "/prod/eigenprofile": prates, "/loss/eigenprofiles": lrates, "/energydeposition": tezs}
+        for name, dat in inputs.items():
+            if isinstance(dat, DataArray):
+                self._check(name, dat, single, i, Nt)
+
+        self._grow("/ut1_unix", ut1_unix)
         # %% VER
         if isinstance(ver, DataArray):
-            d = f.create_dataset("/ver/eigenprofile", data=ver.values, compression="gzip")
-            d.attrs["unit"] = "photons cm^-3 sr^-1 s^-1"
-            d.attrs["size"] = "Ntime x NEnergy x Nalt x Nwavelength"
+            if "/ver/eigenprofile" not in self.f:
+                d = self._create("/ver/eigenprofile", ver, single, energyaxis=1)
+                d.attrs["unit"] = "photons cm^-3 sr^-1 s^-1"
+                d.attrs["size"] = "Ntime x NEnergy x Nalt x Nwavelength"
 
-            d = f.create_dataset("/ver/wavelength", data=ver.wavelength_nm)
-            d.attrs["unit"] = "Angstrom"
+                d = self.f.create_dataset("/ver/wavelength", data=ver.wavelength_nm)
+                d.attrs["unit"] = "Angstrom"
+            self._write("/ver/eigenprofile", ver, single, i, Nt)
         # %% prod
         if isinstance(prates, DataArray):
-            d = f.create_dataset("/prod/eigenprofile", data=prates.values, compression="gzip")
-            d.attrs["unit"] = "particle cm^-3 sr^-1 s^-1"
-            if prates.ndim == 3:
-                d.attrs["size"] = "Ntime x NEnergy x Nalt"
-            else:  # ndim==4
-                d.attrs["size"] = "Ntime x NEnergy x Nalt x Nreaction"
-                d = f.create_dataset("/prod/reaction", data=prates.reaction, dtype=bdt)
-            d.attrs["description"] = "reaction species state"
+            if "/prod/eigenprofile" not in self.f:
+                d = self._create("/prod/eigenprofile", prates, single, energyaxis=1)
+                d.attrs["unit"] = "particle cm^-3 sr^-1 s^-1"
+                if d.ndim == 3:
+                    d.attrs["size"] = "Ntime x NEnergy x Nalt"
+                else:  # ndim==4
+                    d.attrs["size"] = "Ntime x NEnergy x Nalt x Nreaction"
+                    d = self.f.create_dataset("/prod/reaction", data=prates.reaction, dtype=h5py.special_dtype(vlen=bytes))
+                d.attrs["description"] = "reaction species state"
+            self._write("/prod/eigenprofile", prates, single, i, Nt)
         # %% loss
         if isinstance(lrates, DataArray):
-            d = f.create_dataset("/loss/eigenprofiles", data=lrates.values, compression="gzip")
-            d.attrs["unit"] = "particle cm^-3 sr^-1 s^-1"
-            d.attrs["size"] = "Ntime x NEnergy x Nalt x Nreaction"
-            d = f.create_dataset("/loss/reaction", data=lrates.reaction, dtype=bdt)
-            d.attrs["description"] = "reaction species state"
+            if "/loss/eigenprofiles" not in self.f:
+                d = self._create("/loss/eigenprofiles", lrates, single, energyaxis=1)
+                d.attrs["unit"] = "particle cm^-3 sr^-1 s^-1"
+                d.attrs["size"] = "Ntime x NEnergy x Nalt x Nreaction"
+                d = self.f.create_dataset("/loss/reaction", data=lrates.reaction, dtype=h5py.special_dtype(vlen=bytes))
+                d.attrs["description"] = "reaction species state"
+            self._write("/loss/eigenprofiles", lrates, single, i, Nt)
         # %% energy deposition
         if isinstance(tezs, DataArray):
-            d = f.create_dataset("/energydeposition", data=tezs.values, compression="gzip")
-            d.attrs["unit"] = "ergs cm^-3 s^-1"
-            d.attrs["size"] = "Ntime x Nalt x NEnergies"
+            if "/energydeposition" not in self.f:
+                d = self._create("/energydeposition", tezs, single, energyaxis=2)
+                d.attrs["unit"] = "ergs cm^-3 s^-1"
+                d.attrs["size"] = "Ntime x Nalt x NEnergies"
+            self._write("/energydeposition", tezs, single, i, Nt)
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _create(self, name: str, dat: DataArray, single: bool, energyaxis: int) -> h5py.Dataset:
+        shape = dat.shape if single else dat.shape[1:]
+        chunks = [1] + list(shape)
+        chunks[energyaxis] = 1
+
+        return self.f.create_dataset(
+            name, shape=(0,) + shape, maxshape=(None,) + shape, chunks=tuple(chunks), dtype=dat.dtype, **self.compression
+        )
+
+    def _grow(self, name: str, dat: np.ndarray) -> int:
+        d = self.f[name]
+        i = d.shape[0]
+        d.resize(i + dat.shape[0], axis=0)
+        d[i:] = dat
+
+        return i
+
+    def _check(self, name: str, dat: DataArray, single: bool, i: int, Nt: int):
+        if not single and dat.shape[0] != Nt:
+            raise ValueError(f"{name} has {dat.shape[0]} times, expected {Nt}")
+
+        d = self.f.get(name)
+        if (d.shape[0] if d is not None else 0) != i:
+            raise ValueError(f"{name} must be given at every time step")
+
+        shape = dat.shape if single else dat.shape[1:]
+        if d is not None and d.shape[1:] != shape:
+            raise ValueError(f"{name} shape {shape} does not match {d.shape[1:]} already written")
+
+    def _write(self, name: str, dat: DataArray, single: bool, i: int, Nt: int):
+        d = self.f[name]
+        d.resize(i + Nt, axis=0)
+        d[i:] = dat.values[None, ...] if single else dat.values